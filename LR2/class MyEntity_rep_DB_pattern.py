@@ -1,4 +1,71 @@
 import sqlite3
+import time
+
+class InstrumentedCursor:
+    """Обёртка курсора, которая считает прочитанные строки и время выборки.
+
+    Итог передаётся инструментам один раз: когда результат прочитан до конца,
+    курсор закрыт или обёртка удалена.
+    """
+
+    def __init__(self, cursor, instruments, query, seconds):
+        self._cursor = cursor
+        self._instruments = instruments
+        self._query = query
+        self._seconds = seconds
+        self._rows = 0
+        self._reported = False
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        self._seconds += time.perf_counter() - started
+        return result
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            for instrument in self._instruments:
+                instrument(self._query, self._seconds, self._rows)
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._report()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+        self._rows += len(rows)
+        if not rows:
+            self._report()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._report()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._report()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        self._report()
+
 
 class DBConnectionManager:
     _instance = None
@@ -13,6 +80,8 @@ class DBConnectionManager:
         """Инициализация соединения SQLite"""
         self.connection = sqlite3.connect(db_name)
         self.cursor = self.connection.cursor()
+        # Инструменты замеров: вызываются как instrument(query, seconds, rows) после каждого запроса
+        self.instruments = []
         self._initialize_table()
 
     def _initialize_table(self):
@@ -32,8 +101,27 @@ class DBConnectionManager:
         """Выполняет SQL-запрос с параметрами."""
         if params is None:
             params = ()
+        if not self.instruments:
+            self.cursor.execute(query, params)
+            return self.cursor
+        started = time.perf_counter()
         self.cursor.execute(query, params)
-        return self.cursor
+        seconds = time.perf_counter() - started
+        if self.cursor.description is None:
+            # Запрос без результата (INSERT, UPDATE, DELETE, DDL): строки известны сразу.
+            for instrument in self.instruments:
+                instrument(query, seconds, self.cursor.rowcount)
+            return self.cursor
+        # Для SELECT строки считаются по мере чтения.
+        return InstrumentedCursor(self.cursor, self.instruments, query, seconds)
+
+    def add_instrument(self, instrument):
+        """Подключить инструмент замеров запросов."""
+        self.instruments.append(instrument)
+
+    def remove_instrument(self, instrument):
+        """Отключить инструмент замеров запросов."""
+        self.instruments.remove(instrument)
 
     def commit(self):
         """Подтверждает транзакцию."""
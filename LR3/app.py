@@ -1,11 +1,80 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
+import time
+
+class InstrumentedCursor:
+    """Обёртка курсора, которая считает прочитанные строки и время выборки
+
+    Итог передаётся инструментам один раз: когда результат прочитан до конца,
+    курсор закрыт или обёртка удалена
+    """
+
+    def __init__(self, cursor, instruments, query, seconds):
+        self._cursor = cursor
+        self._instruments = instruments
+        self._query = query
+        self._seconds = seconds
+        self._rows = 0
+        self._reported = False
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        self._seconds += time.perf_counter() - started
+        return result
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            for instrument in self._instruments:
+                instrument(self._query, self._seconds, self._rows)
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._report()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+        self._rows += len(rows)
+        if not rows:
+            self._report()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._report()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._report()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        self._report()
+
 
 class DBConnectionManager:
     def __init__(self, db_name="drivers.db"):
         self.connection = sqlite3.connect(db_name)
         self.cursor = self.connection.cursor()
+        # Инструменты замеров: вызываются как instrument(query, seconds, rows) после каждого запроса
+        self.instruments = []
         self._initialize_table()
 
     def _initialize_table(self):
@@ -25,8 +94,27 @@ class DBConnectionManager:
         """Выполняет SQL-запрос с параметрами"""
         if params is None:
             params = ()
+        if not self.instruments:
+            self.cursor.execute(query, params)
+            return self.cursor
+        started = time.perf_counter()
         self.cursor.execute(query, params)
-        return self.cursor
+        seconds = time.perf_counter() - started
+        if self.cursor.description is None:
+            # Запрос без результата (INSERT, UPDATE, DELETE, DDL): строки известны сразу
+            for instrument in self.instruments:
+                instrument(query, seconds, self.cursor.rowcount)
+            return self.cursor
+        # Для SELECT строки считаются по мере чтения
+        return InstrumentedCursor(self.cursor, self.instruments, query, seconds)
+
+    def add_instrument(self, instrument):
+        """Подключить инструмент замеров запросов"""
+        self.instruments.append(instrument)
+
+    def remove_instrument(self, instrument):
+        """Отключить инструмент замеров запросов"""
+        self.instruments.remove(instrument)
 
     def commit(self):
         """Подтверждает транзакцию"""
@@ -39,39 +127,171 @@ class DBConnectionManager:
 
 
 class RepositoryWithObserver:
+    # Столбцы, по которым разрешена сортировка; для каждого, кроме ID, создаётся индекс
+    SORTABLE_COLUMNS = ("DriverId", "LastName", "FirstName", "Experience")
+    # Столбцы строк таблицы в окне
+    WINDOW_COLUMNS = ("DriverId", "LastName", "FirstName", "Experience")
+    # Сколько строк таблицы показывается за раз
+    page_size = 100
+
     def __init__(self, db_name="drivers.db"):
         self.db_manager = DBConnectionManager(db_name)
         self.observers = []
+        # Видимое окно: порядок сортировки, ключ (значение, ID) строки перед окном
+        # (None — окно в начале таблицы), номер первой строки окна и сами строки
+        self.sort_column = "DriverId"
+        self.descending = False
+        self.anchor = None
+        self.offset = 0
+        self.window = []
+        # Число записей: считается один раз и дальше поддерживается при изменениях
+        self._count = None
+        self._create_sort_indexes()
+
+    def _create_sort_indexes(self):
+        """Создать индексы (столбец, ID) для сортируемых столбцов"""
+        for column in self.SORTABLE_COLUMNS:
+            if column != "DriverId":
+                self.db_manager.execute_query(
+                    f"CREATE INDEX IF NOT EXISTS idx_drivers_{column.lower()} ON drivers ({column}, DriverId)"
+                )
+        self.db_manager.commit()
 
     def add_observer(self, observer):
         """Добавить наблюдателя"""
         self.observers.append(observer)
 
     def notify_observers(self):
-        """Уведомить наблюдателей об изменениях"""
-        data = self.get_all_records()
+        """Уведомить наблюдателей об изменениях, передав только видимое окно"""
+        data = self.get_visible_window()
         for observer in self.observers:
             observer.update(data)
 
     def add_record(self, record):
         """Добавить запись в базу данных"""
         query = "INSERT INTO drivers (LastName, FirstName, Patronymic, Experience) VALUES (?, ?, ?, ?)"
-        self.db_manager.execute_query(query, (record['LastName'], record['FirstName'], record['Patronymic'], record['Experience']))
+        cursor = self.db_manager.execute_query(query, (record['LastName'], record['FirstName'], record['Patronymic'], record['Experience']))
         self.db_manager.commit()
+        if self._count is not None:
+            self._count += 1
+        # Запись, попавшая перед окном, сдвигает номера его строк
+        key = (cursor.lastrowid if self.sort_column == "DriverId" else record[self.sort_column], cursor.lastrowid)
+        if self._precedes_window(key):
+            self.offset += 1
         self.notify_observers()
 
     def delete_record(self, record_id):
         """Удалить запись по ID"""
-        query = "DELETE FROM drivers WHERE DriverId = ?"
-        self.db_manager.execute_query(query, (record_id,))
+        row = self.get_by_id(record_id)
+        if row is None:
+            return
+        key = self._row_key(dict(zip(("DriverId", "LastName", "FirstName", "Patronymic", "Experience"), row)))
+        self.db_manager.execute_query("DELETE FROM drivers WHERE DriverId = ?", (record_id,))
         self.db_manager.commit()
+        if self._count is not None:
+            self._count -= 1
+        if self._precedes_window(key):
+            self.offset -= 1
         self.notify_observers()
 
-    def sort_by_field(self, field):
-        """Сортировать записи по указанному полю"""
-        query = f"SELECT DriverId, LastName, FirstName, Experience FROM drivers ORDER BY {field}"
-        cursor = self.db_manager.execute_query(query)
-        return cursor.fetchall()
+    def _row_key(self, row):
+        """Ключ строки (значение столбца сортировки, ID); row — словарь или строка окна"""
+        if isinstance(row, dict):
+            return row[self.sort_column], row["DriverId"]
+        return row[self.WINDOW_COLUMNS.index(self.sort_column)], row[0]
+
+    def _precedes_window(self, key):
+        """Стоит ли строка с ключом key перед видимым окном (не позже строки-якоря)"""
+        if self.anchor is None:
+            return False
+        return key >= self.anchor if self.descending else key <= self.anchor
+
+    def get_page(self, limit=None, after=None, before=None, sort_column="DriverId", descending=False):
+        """Получить до limit записей в порядке sort_column поиском по индексу (столбец, ID), без OFFSET.
+
+        after — ключ (значение, ID) строки, после которой начинается страница; before — ключ
+        строки, перед которой страница заканчивается. Стоимость не зависит от глубины страницы.
+        """
+        if sort_column not in self.SORTABLE_COLUMNS:
+            raise ValueError(f"Сортировка по полю {sort_column} не поддерживается")
+        limit = self.page_size if limit is None else limit
+        # Страница перед ключом выбирается в обратном порядке и затем разворачивается
+        backward = before is not None
+        key = before if backward else after
+        reverse = descending != backward
+        direction = "DESC" if reverse else "ASC"
+        conditions, params = [], []
+        if key is not None:
+            operator = "<" if reverse else ">"
+            if sort_column == "DriverId":
+                conditions.append(f"DriverId {operator} ?")
+                params.append(key[1])
+            else:
+                conditions.append(f"({sort_column}, DriverId) {operator} (?, ?)")
+                params.extend(key)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order_by = f"{sort_column} {direction}"
+        if sort_column != "DriverId":
+            order_by += f", DriverId {direction}"
+        query = (f"SELECT {', '.join(self.WINDOW_COLUMNS)} FROM drivers {where} "
+                 f"ORDER BY {order_by} LIMIT ?")
+        rows = self.db_manager.execute_query(query, params + [limit]).fetchall()
+        return rows[::-1] if backward else rows
+
+    def get_visible_window(self):
+        """Получить записи видимого окна; если после удаления окно опустело, показать предыдущее"""
+        self.window = self.get_page(self.page_size, self.anchor, None, self.sort_column, self.descending)
+        if not self.window and self.anchor is not None:
+            return self.previous_window()
+        return self.window
+
+    def next_window(self):
+        """Сдвинуть видимое окно на страницу вперёд и вернуть его записи"""
+        if not self.window:
+            return self.get_visible_window()
+        rows = self.get_page(self.page_size, self._row_key(self.window[-1]), None, self.sort_column, self.descending)
+        if rows:
+            self.anchor = self._row_key(self.window[-1])
+            self.offset += len(self.window)
+            self.window = rows
+        return self.window
+
+    def previous_window(self):
+        """Сдвинуть видимое окно на страницу назад и вернуть его записи"""
+        if self.anchor is None:
+            return self.get_visible_window()
+        # Строка сверх страницы — якорь нового окна; если её нет, окно в начале таблицы
+        boundary = self._row_key(self.window[0]) if self.window else None
+        if boundary is None:
+            rows = self.get_page(self.page_size + 1, None, None, self.sort_column, not self.descending)[::-1]
+        else:
+            rows = self.get_page(self.page_size + 1, None, boundary, self.sort_column, self.descending)
+        if len(rows) > self.page_size:
+            self.anchor = self._row_key(rows[0])
+            rows = rows[1:]
+            self.offset = max(0, self.offset - len(rows))
+        else:
+            self.anchor = None
+            self.offset = 0
+        self.window = rows
+        return self.window
+
+    def sort_by_field(self, field, descending=False):
+        """Сортировать записи по указанному полю и вернуть первое окно"""
+        if field not in self.SORTABLE_COLUMNS:
+            raise ValueError(f"Сортировка по полю {field} не поддерживается")
+        self.sort_column = field
+        self.descending = descending
+        self.anchor = None
+        self.offset = 0
+        return self.get_visible_window()
+
+    def get_count(self):
+        """Получить количество записей (COUNT(*) выполняется только при первом вызове)"""
+        if self._count is None:
+            cursor = self.db_manager.execute_query("SELECT COUNT(*) FROM drivers")
+            self._count = cursor.fetchone()[0]
+        return self._count
 
     def get_all_records(self):
         """Получить все записи"""
@@ -109,6 +329,10 @@ class MainView:
         tk.Button(btn_frame, text="Добавить", command=self.open_add_record_window).pack(side=tk.LEFT, padx=5, pady=5)
         tk.Button(btn_frame, text="Удалить", command=self.delete_record).pack(side=tk.LEFT, padx=5, pady=5)
         tk.Button(btn_frame, text="Детали", command=self.open_details_window).pack(side=tk.LEFT, padx=5, pady=5)
+        tk.Button(btn_frame, text="Вперёд", command=lambda: self.controller.next_page()).pack(side=tk.RIGHT, padx=5, pady=5)
+        tk.Button(btn_frame, text="Назад", command=lambda: self.controller.previous_page()).pack(side=tk.RIGHT, padx=5, pady=5)
+        self.window_label = tk.Label(btn_frame)
+        self.window_label.pack(side=tk.RIGHT, padx=5, pady=5)
 
     def sort_table(self, field):
         """Обработать сортировку по полю"""
@@ -143,6 +367,10 @@ class MainView:
         for row in data:
             self.table.insert("", tk.END, values=row)
 
+    def update_window_label(self, first, last, total):
+        """Показать, какие строки таблицы сейчас видны"""
+        self.window_label.config(text=f"{first}–{last} из {total}")
+
 
 
 class MainController:
@@ -155,6 +383,8 @@ class MainController:
     def update(self, data):
         """Обновить представление"""
         self.view.update_table(data)
+        self.view.update_window_label(self.model.offset + 1 if data else 0, self.model.offset + len(data),
+                                      self.model.get_count())
 
     def open_add_record_window(self):
         """Открыть окно добавления записи"""
@@ -172,9 +402,17 @@ class MainController:
                                           f"Отчество: {details[3]}\nОпыт: {details[4]} лет")
 
     def sort_records(self, field):
-        """Сортировать записи"""
-        sorted_data = self.model.sort_by_field(field)
-        self.view.update_table(sorted_data)
+        """Сортировать записи; повторное нажатие на тот же столбец меняет направление"""
+        descending = field == self.model.sort_column and not self.model.descending
+        self.update(self.model.sort_by_field(field, descending))
+
+    def next_page(self):
+        """Показать следующее окно записей"""
+        self.update(self.model.next_window())
+
+    def previous_page(self):
+        """Показать предыдущее окно записей"""
+        self.update(self.model.previous_window())
 
 
 class AddRecordWindow:
@@ -219,6 +457,7 @@ if __name__ == "__main__":
     view = MainView(None)
     controller = MainController(model, view)
     view.controller = controller
+    model.notify_observers()
 
     # Запуск приложения
     view.root.mainloop()
@@ -1,18 +1,34 @@
+import os
 from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
 from controller import Controller
 from view import WebView
 from model import Model
 
+# Журнал медленных запросов включается переменной окружения LR4_SLOW_QUERY_LOG (имя файла журнала);
+# порог в секундах задаёт LR4_SLOW_QUERY_THRESHOLD
+SLOW_QUERY_LOG = os.environ.get("LR4_SLOW_QUERY_LOG") or None
+SLOW_QUERY_THRESHOLD = float(os.environ.get("LR4_SLOW_QUERY_THRESHOLD", "0.1"))
+
 
 class WebRequestHandler(BaseHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
-        self.controller = Controller(Model(), WebView())  # Передаем модель и представление
+        model = Model(slow_query_log=SLOW_QUERY_LOG, slow_query_threshold=SLOW_QUERY_THRESHOLD)
+        self.controller = Controller(model, WebView())  # Передаем модель и представление
         super().__init__(*args, **kwargs)
 
     def do_GET(self):
         try:
-            if self.path == "/":
-                response = self.controller.index()
+            url = urlparse(self.path)
+            if url.path == "/":
+                query = parse_qs(url.query)
+                after, before = self._id_param(query, "after"), self._id_param(query, "before")
+                # Некорректный курсор страницы — показываем первую страницу
+                response = self.controller.index(after, before if after is None else None)
+                self._send_response(200, response)
+            elif url.path == "/search":
+                query = parse_qs(url.query).get("q", [""])[0]
+                response = self.controller.search(query)
                 self._send_response(200, response)
             elif self.path.startswith("/details/"):
                 record_id = int(self.path.split("/")[-1])
@@ -49,6 +65,15 @@ class WebRequestHandler(BaseHTTPRequestHandler):
         except Exception as e:
             self._send_response(500, f"<h1>Ошибка сервера</h1><p>{e}</p>")
 
+    @staticmethod
+    def _id_param(query, name):
+        """ID записи из параметра запроса name или None, если параметра нет или он некорректен"""
+        value = query.get(name, [""])[0]
+        # Больше 2**63 - 1 в целочисленный столбец SQLite не передать
+        if value.isascii() and value.isdigit() and int(value) < 1 << 63:
+            return int(value)
+        return None
+
     def _send_response(self, status, content):
         self.send_response(status)
         self.send_header("Content-type", "text/html")
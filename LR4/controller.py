@@ -1,21 +1,49 @@
 from model import Model
 from iview import IView
 from urllib.parse import parse_qs
+import html
 
 class Controller:
+    PAGE_SIZE = 50
+
     def __init__(self, model: Model, view: IView):
         self.model = model
         self.view = view
 
-    def index(self):
-        """Главная страница с таблицей записей"""
-        records = self.model.get_all_records()
+    def index(self, after_id=None, before_id=None):
+        """Главная страница с таблицей записей (страница после записи after_id или перед записью before_id)"""
+        records = self.model.get_records_page(self.PAGE_SIZE + 1, after_id, before_id)
+        # Лишняя запись показывает, есть ли ещё страница в направлении выборки
+        has_more = len(records) > self.PAGE_SIZE
+        if before_id is not None:
+            records = records[1:] if has_more else records
+            has_previous, has_next = has_more, True
+        else:
+            records = records[:self.PAGE_SIZE]
+            has_previous, has_next = after_id is not None, has_more
+        links = []
+        if has_previous and records:
+            links.append(f"<a href='/?before={records[0][0]}'>Предыдущая страница</a>")
+        if has_next and records:
+            links.append(f"<a href='/?after={records[-1][0]}'>Следующая страница</a>")
+        next_link = " | ".join(links)
         rows = "\n".join(
             f"<tr><td>{r[0]}</td><td>{r[1]}</td><td>{r[2]}</td><td>{r[3]}</td>"
             f"<td><a href='/details/{r[0]}'>Детали</a> | <a href='/edit/{r[0]}'>Редактировать</a> | <a href='/delete/{r[0]}'>Удалить</a></td></tr>"
             for r in records
         )
-        return self.view.render_template("index.html", records=rows)
+        return self.view.render_template("index.html", records=rows, next_link=next_link)
+
+    def search(self, query):
+        """Страница результатов поиска по ФИО, наиболее релевантные записи первыми"""
+        records = self.model.search_records(query) if query.strip() else []
+        rows = "\n".join(
+            f"<tr><td>{r[0]}</td><td>{html.escape(r[1])}</td><td>{html.escape(r[2])}</td><td>{r[3]}</td>"
+            f"<td><a href='/details/{r[0]}'>Детали</a> | <a href='/edit/{r[0]}'>Редактировать</a></td></tr>"
+            for r in records
+        )
+        return self.view.render_template("search.html", query=html.escape(query), records=rows,
+                                         count=len(records))
 
     def details(self, record_id):
         """Просмотр деталей записи"""
@@ -1,12 +1,40 @@
+import re
 import sqlite3
+import time
+
+from slow_query_log import SlowQueryLog
 
 class Model:
-    def __init__(self, db_name="database.db"):
+    # Значения ФИО для полнотекстового индекса: unicode61 не приравнивает «ё» к «е».
+    _FTS_VALUES = ", ".join(f"replace(replace({{row}}{column}, 'ё', 'е'), 'Ё', 'Е')"
+                            for column in ("LastName", "FirstName", "Patronymic"))
+
+    def __init__(self, db_name="database.db", slow_query_log=None, slow_query_threshold=0.1):
         self.connection = sqlite3.connect(db_name)
         self.connection.row_factory = sqlite3.Row  # Позволяет доступ по ключам
         self.cursor = self.connection.cursor()
+        # Журнал медленных запросов включается передачей имени файла в slow_query_log.
+        self.slow_query_log = SlowQueryLog(slow_query_log, slow_query_threshold) if slow_query_log else None
         self._initialize_table()
 
+    def _execute(self, query, params=(), fetch=None):
+        """Выполнить запрос и, если нужно, получить результат (fetch: "one" или "all").
+
+        Запросы дольше slow_query_threshold секунд записываются в журнал медленных
+        запросов вместе с планом выполнения; значения параметров заменяются их типами.
+        """
+        started = time.perf_counter()
+        self.cursor.execute(query, params)
+        if fetch == "one":
+            result = self.cursor.fetchone()
+        elif fetch == "all":
+            result = self.cursor.fetchall()
+        else:
+            result = None
+        if self.slow_query_log is not None:
+            self.slow_query_log.record(self.connection, query, params, time.perf_counter() - started)
+        return result
+
     def _initialize_table(self):
         try:
             self.cursor.execute("""
@@ -21,26 +49,116 @@ class Model:
             self.connection.commit()
         except sqlite3.Error as e:
             print(f"Ошибка при инициализации таблицы: {e}")
+        self._initialize_search()
+
+    def _initialize_search(self):
+        """Полнотекстовый индекс FTS5 по ФИО, который триггеры держат в актуальном состоянии."""
+        self.fts_enabled = False
+        try:
+            exists = self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'drivers_fts'").fetchone()
+            self.cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS drivers_fts USING fts5(
+                    LastName, FirstName, Patronymic,
+                    content='drivers', content_rowid='DriverId', tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            new_values, old_values = self._FTS_VALUES.format(row="new."), self._FTS_VALUES.format(row="old.")
+            self.cursor.executescript(f"""
+                CREATE TRIGGER IF NOT EXISTS drivers_fts_insert AFTER INSERT ON drivers BEGIN
+                    INSERT INTO drivers_fts (rowid, LastName, FirstName, Patronymic)
+                    VALUES (new.DriverId, {new_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS drivers_fts_delete AFTER DELETE ON drivers BEGIN
+                    INSERT INTO drivers_fts (drivers_fts, rowid, LastName, FirstName, Patronymic)
+                    VALUES ('delete', old.DriverId, {old_values});
+                END;
+                CREATE TRIGGER IF NOT EXISTS drivers_fts_update AFTER UPDATE ON drivers BEGIN
+                    INSERT INTO drivers_fts (drivers_fts, rowid, LastName, FirstName, Patronymic)
+                    VALUES ('delete', old.DriverId, {old_values});
+                    INSERT INTO drivers_fts (rowid, LastName, FirstName, Patronymic)
+                    VALUES (new.DriverId, {new_values});
+                END;
+            """)
+            if not exists:
+                self.cursor.execute(f"""
+                    INSERT INTO drivers_fts (rowid, LastName, FirstName, Patronymic)
+                    SELECT DriverId, {self._FTS_VALUES.format(row="")} FROM drivers
+                """)
+            self.connection.commit()
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            print(f"Полнотекстовый поиск недоступен: {e}")
 
     def get_all_records(self):
         try:
-            self.cursor.execute("SELECT DriverId, LastName, FirstName, Experience FROM drivers")
-            return self.cursor.fetchall()
+            return self._execute("SELECT DriverId, LastName, FirstName, Experience FROM drivers", fetch="all")
         except sqlite3.Error as e:
             print(f"Ошибка при получении записей: {e}")
             return []
 
+    def get_records_page(self, limit, after_id=None, before_id=None):
+        """Получить limit записей с DriverId больше after_id или, если задан before_id,
+        limit последних записей с DriverId меньше before_id (поиск по первичному ключу)."""
+        try:
+            if before_id is not None:
+                records = self._execute(
+                    "SELECT DriverId, LastName, FirstName, Experience FROM drivers "
+                    "WHERE DriverId < ? ORDER BY DriverId DESC LIMIT ?",
+                    (before_id, limit), fetch="all"
+                )
+                return records[::-1]
+            return self._execute(
+                "SELECT DriverId, LastName, FirstName, Experience FROM drivers "
+                "WHERE DriverId > ? ORDER BY DriverId LIMIT ?",
+                (after_id or 0, limit), fetch="all"
+            )
+        except sqlite3.Error as e:
+            print(f"Ошибка при получении страницы записей: {e}")
+            return []
+
+    def search_records(self, query, limit=20):
+        """Найти записи, в ФИО которых есть слова, начинающиеся с каждого слова query.
+
+        Результаты упорядочены по релевантности: фамилия весит больше имени, имя — больше отчества.
+        """
+        tokens = re.findall(r"\w+", query.lower().replace("ё", "е"))
+        if not tokens:
+            return []
+        try:
+            if self.fts_enabled:
+                return self._execute(
+                    "SELECT d.DriverId, d.LastName, d.FirstName, d.Experience "
+                    "FROM drivers_fts JOIN drivers d ON d.DriverId = drivers_fts.rowid "
+                    "WHERE drivers_fts MATCH ? ORDER BY bm25(drivers_fts, 10.0, 5.0, 1.0), d.DriverId LIMIT ?",
+                    (" ".join(f'"{token}"*' for token in tokens), limit), fetch="all"
+                )
+            # Без FTS5: просмотр всей таблицы (LIKE в SQLite сравнивает кириллицу с учётом регистра).
+            records = self._execute(
+                "SELECT DriverId, LastName, FirstName, Patronymic, Experience FROM drivers ORDER BY DriverId",
+                fetch="all"
+            )
+            found = []
+            for record in records:
+                words = re.findall(r"\w+", " ".join(filter(None, record[1:4])).lower().replace("ё", "е"))
+                if all(any(word.startswith(token) for word in words) for token in tokens):
+                    found.append((record[0], record[1], record[2], record[4]))
+                    if len(found) == limit:
+                        break
+            return found
+        except sqlite3.Error as e:
+            print(f"Ошибка при поиске записей: {e}")
+            return []
+
     def get_record_by_id(self, record_id):
         try:
-            self.cursor.execute("SELECT * FROM drivers WHERE DriverId = ?", (record_id,))
-            return self.cursor.fetchone()
+            return self._execute("SELECT * FROM drivers WHERE DriverId = ?", (record_id,), fetch="one")
         except sqlite3.Error as e:
             print(f"Ошибка при получении записи по ID: {e}")
             return None
 
     def add_record(self, last_name, first_name, patronymic, experience):
         try:
-            self.cursor.execute(
+            self._execute(
                 "INSERT INTO drivers (LastName, FirstName, Patronymic, Experience) VALUES (?, ?, ?, ?)",
                 (last_name, first_name, patronymic, experience)
             )
@@ -52,7 +170,7 @@ class Model:
     def update_record(self, record_id, last_name, first_name, patronymic, experience):
         try:
             record_id = int(record_id)  # Преобразуем ID в число для безопасности
-            self.cursor.execute(
+            self._execute(
                 "UPDATE drivers SET LastName = ?, FirstName = ?, Patronymic = ?, Experience = ? WHERE DriverId = ?",
                 (last_name, first_name, patronymic, experience, record_id)
             )
@@ -64,7 +182,7 @@ class Model:
 
     def delete_record(self, record_id):
         try:
-            self.cursor.execute("DELETE FROM drivers WHERE DriverId = ?", (record_id,))
+            self._execute("DELETE FROM drivers WHERE DriverId = ?", (record_id,))
             self.connection.commit()
         except sqlite3.Error as e:
             print(f"Ошибка при удалении записи: {e}")
@@ -0,0 +1,61 @@
+import logging
+import os
+import sqlite3
+from collections.abc import Mapping
+from logging.handlers import RotatingFileHandler
+
+
+# Копия query_stats.SlowQueryLog из LR5: LR4 запускается и поставляется отдельно
+# от LR5, поэтому журнал не импортируется из соседней работы.
+class SlowQueryLog:
+    """Журнал медленных запросов с планом выполнения (EXPLAIN QUERY PLAN).
+
+    Пишет в локальный файл с ротацией по размеру. Значения параметров
+    не сохраняются: вместо них записываются только их типы (и длина строк).
+    """
+
+    def __init__(self, filename, threshold=0.1, max_bytes=1 << 20, backup_count=3):
+        self.filename = filename
+        self.threshold = threshold
+        self.logger = logging.getLogger(f"slow_query_log.{os.path.abspath(filename)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def _redact_value(value):
+        if isinstance(value, str):
+            return f"<str:{len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    @classmethod
+    def redact(cls, params):
+        """Заменить значения параметров их типами; у именованных параметров имена сохраняются."""
+        if isinstance(params, Mapping):
+            return {name: cls._redact_value(value) for name, value in params.items()}
+        return [cls._redact_value(value) for value in params]
+
+    @staticmethod
+    def explain(connection, query, params):
+        """Строки плана выполнения запроса или пустой список, если план получить нельзя."""
+        try:
+            return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def record(self, connection, query, params, seconds):
+        """Записать запрос в журнал, если он выполнялся дольше порога."""
+        if seconds < self.threshold:
+            return
+        plan = self.explain(connection, query, params)
+        # Просмотр виртуальной таблицы (FTS5) идёт по её собственному индексу и полным не считается.
+        full_scan = any(step.startswith("SCAN") and "USING" not in step and "VIRTUAL TABLE" not in step
+                        for step in plan)
+        self.logger.warning(
+            "slow query %.1f ms%s\n  sql: %s\n  params: %s\n  plan: %s",
+            seconds * 1000, " [FULL SCAN]" if full_scan else "",
+            " ".join(query.split()), self.redact(params), "; ".join(plan) or "-",
+        )
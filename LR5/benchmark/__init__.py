@@ -0,0 +1,2 @@
+from benchmark.generator import generate, generate_drivers, generate_routes, generate_shipments
+from benchmark.suite import BenchmarkSuite, BenchmarkResult, dump_results, save_results, load_results, compare_results
@@ -0,0 +1,56 @@
+"""Запуск замеров: python -m benchmark --sizes 1e3 1e4 --backends json sqlite --output results.json
+
+Запускается из каталога LR5.
+"""
+import argparse
+import sys
+import tempfile
+
+from benchmark.suite import (BACKENDS, ENTITIES, BenchmarkSuite, dump_results, save_results,
+                             load_results, compare_results)
+
+
+def _size(value):
+    return int(float(value))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description="Замеры операций репозиториев JSON, YAML, двоичного снимка, "
+                                                 "SQLite и mmap.")
+    parser.add_argument("--sizes", nargs="+", type=_size, default=[1000, 10000],
+                        help="число записей (от 1e3 до 1e7)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--entities", nargs="+", choices=sorted(ENTITIES), default=["shipments"])
+    parser.add_argument("--lookups", type=int, default=1000, help="число вызовов get_by_id")
+    parser.add_argument("--pages", type=int, default=100, help="число запрошенных страниц")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--mutations", type=int, default=10, help="число add, replace и delete")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="каталог для сгенерированных данных (по умолчанию временный)")
+    parser.add_argument("--output", help="файл для результатов в JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="результаты прежнего прогона для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление, доля")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temporary:
+        suite = BenchmarkSuite(args.workdir or temporary, args.sizes, args.backends, args.entities,
+                               args.lookups, args.pages, args.page_size, args.mutations, args.seed)
+        results = suite.run(progress=lambda result: print(result, file=sys.stderr))
+    if args.output:
+        save_results(args.output, suite.metadata(), results)
+    else:
+        dump_results(sys.stdout, suite.metadata(), results)
+
+    if args.compare:
+        _, baseline = load_results(args.compare)
+        regressions = compare_results(baseline, results, args.tolerance)
+        for key, previous, current, ratio in regressions:
+            print(f"РЕГРЕССИЯ {'/'.join(map(str, key))}: {previous * 1000:.3f} ms -> "
+                  f"{current * 1000:.3f} ms (x{ratio:.2f})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import json
+import random
+from datetime import date, timedelta
+import yaml
+from models import YAMLDumper
+
+
+LAST_NAMES = ("Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов",
+              "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов")
+FIRST_NAMES = ("Иван", "Пётр", "Сергей", "Алексей", "Дмитрий", "Андрей", "Михаил", "Николай",
+               "Владимир", "Юрий", "Олег", "Павел")
+PATRONYMICS = ("Иванович", "Петрович", "Сергеевич", "Алексеевич", "Дмитриевич", "Андреевич",
+               "Михайлович", "Николаевич", "Владимирович", "Юрьевич")
+CITIES = ("Москва", "Санкт-Петербург", "Казань", "Нижний Новгород", "Самара", "Екатеринбург",
+          "Новосибирск", "Воронеж", "Ростов-на-Дону", "Краснодар", "Пермь", "Уфа", "Тверь", "Ярославль")
+# Буквы, допустимые в российских номерных знаках.
+PLATE_LETTERS = "АВЕКМНОРСТУХ"
+
+_EPOCH = date(2020, 1, 1)
+
+
+def _digits(rng, count):
+    return "".join(rng.choice("0123456789") for _ in range(count))
+
+
+def _date(day):
+    return day.strftime("%d.%m.%Y")
+
+
+def generate_drivers(count, seed=0):
+    """Сгенерировать count водителей (словари полей) в форматах, которые принимает Validator."""
+    rng = random.Random(seed)
+    for driver_id in range(1, count + 1):
+        yield {
+            "driver_id": driver_id,
+            "last_name": rng.choice(LAST_NAMES),
+            "first_name": rng.choice(FIRST_NAMES),
+            "patronymic": rng.choice(PATRONYMICS),
+            "birthday": _date(date(1960, 1, 1) + timedelta(days=rng.randrange(14600))),
+            "phone_number": f"+7({_digits(rng, 3)}){_digits(rng, 3)}-{_digits(rng, 2)}-{_digits(rng, 2)}",
+            "driver_license": f"{_digits(rng, 2)} {_digits(rng, 2)} {_digits(rng, 6)}",
+            "vehicle_title": f"{_digits(rng, 2)} {_digits(rng, 2)} {_digits(rng, 6)}",
+            "insurance_policy": f"{_digits(rng, 3)} {_digits(rng, 12)}",
+            "license_plate": (f"{rng.choice(PLATE_LETTERS)}{_digits(rng, 3)}"
+                              f"{rng.choice(PLATE_LETTERS)}{rng.choice(PLATE_LETTERS)}{rng.randint(10, 799)}"),
+            "experience": rng.randint(1, 40),
+        }
+
+
+def generate_routes(count, seed=0):
+    """Сгенерировать count маршрутов с оплатой, пропорциональной расстоянию."""
+    rng = random.Random(seed)
+    for route_id in range(1, count + 1):
+        start, end = rng.sample(CITIES, 2)
+        distance = rng.randint(10, 3000)
+        yield {
+            "route_id": route_id,
+            "route_name": f"{start} — {end}",
+            "start_route": start,
+            "end_route": end,
+            "distance": distance,
+            "driver_payment": distance * rng.randint(20, 40),
+        }
+
+
+def generate_shipments(count, driver_count, route_count, seed=0):
+    """Сгенерировать count перевозок; прибытие не раньше отправления, ссылки в пределах 1..*_count."""
+    rng = random.Random(seed)
+    for shipment_id in range(1, count + 1):
+        departure = _EPOCH + timedelta(days=rng.randrange(2190))
+        yield {
+            "shipment_id": shipment_id,
+            "route_id": rng.randint(1, route_count),
+            "driver_id": rng.randint(1, driver_count),
+            "departure_date": _date(departure),
+            "arrival_date": _date(departure + timedelta(days=rng.randint(0, 10))),
+            "bonus": rng.choice((0, 0, 0, 500, 1000, 2500)),
+        }
+
+
+def generate(entity, count, seed=0):
+    """Сгенерировать count записей сущности drivers, routes или shipments."""
+    if entity == "drivers":
+        return generate_drivers(count, seed)
+    if entity == "routes":
+        return generate_routes(count, seed)
+    if entity == "shipments":
+        references = max(1, count // 10)
+        return generate_shipments(count, references, references, seed)
+    raise ValueError(f"Неизвестная сущность {entity}.")
+
+
+def write_json(filename, rows):
+    """Записать записи в JSON-массив потоково, не собирая их в памяти."""
+    with open(filename, "w", encoding="utf-8") as file:
+        file.write("[")
+        for position, row in enumerate(rows):
+            file.write(",\n" if position else "\n")
+            file.write(json.dumps(row, ensure_ascii=False))
+        file.write("\n]\n")
+
+
+def write_yaml(filename, rows):
+    """Записать записи в YAML-список по одной, не собирая их в памяти."""
+    with open(filename, "w", encoding="utf-8") as file:
+        for row in rows:
+            yaml.dump([row], file, Dumper=YAMLDumper, allow_unicode=True, sort_keys=False)
@@ -0,0 +1,256 @@
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from drivers import (Driver, DriversRepositoryJSON, DriversRepositoryYAML, DriversRepositoryBinary,
+                     DriversRepositoryDB)
+from routes import Route, RoutesRepositoryJSON, RoutesRepositoryYAML, RoutesRepositoryBinary, RoutesRepositoryDB
+from shipments import (Shipment, ShipmentsRepositoryJSON, ShipmentsRepositoryYAML, ShipmentsRepositoryBinary,
+                       ShipmentsRepositoryDB, ShipmentsRepositoryMMap)
+from models import yaml_cache
+from benchmark.generator import generate, write_json, write_yaml
+
+
+# Классы сущностей и репозиториев по сущности и хранилищу (mmap есть только у перевозок).
+ENTITIES = {
+    "drivers": (Driver, {"json": DriversRepositoryJSON, "yaml": DriversRepositoryYAML,
+                         "binary": DriversRepositoryBinary, "sqlite": DriversRepositoryDB}),
+    "routes": (Route, {"json": RoutesRepositoryJSON, "yaml": RoutesRepositoryYAML,
+                       "binary": RoutesRepositoryBinary, "sqlite": RoutesRepositoryDB}),
+    "shipments": (Shipment, {"json": ShipmentsRepositoryJSON, "yaml": ShipmentsRepositoryYAML,
+                             "binary": ShipmentsRepositoryBinary, "sqlite": ShipmentsRepositoryDB,
+                             "mmap": ShipmentsRepositoryMMap}),
+}
+# Поле для операции sort: первая страница в порядке этого поля.
+SORT_KEYS = {
+    "drivers": "last_name",
+    "routes": "route_name",
+    "shipments": "departure_date",
+}
+BACKENDS = ("json", "yaml", "binary", "sqlite", "mmap")
+OPERATIONS = ("load", "count", "get_by_id", "paging", "sort", "add", "replace", "delete")
+
+
+class BenchmarkResult:
+    """Замер одной операции: сколько раз выполнена и за какое суммарное время."""
+
+    def __init__(self, entity, backend, rows, operation, ops, seconds):
+        self.entity = entity
+        self.backend = backend
+        self.rows = rows
+        self.operation = operation
+        self.ops = ops
+        self.seconds = seconds
+
+    @property
+    def key(self):
+        """Ключ для сопоставления замеров разных прогонов."""
+        return self.entity, self.backend, self.rows, self.operation
+
+    @property
+    def per_op(self):
+        """Среднее время одной операции, в секундах."""
+        return self.seconds / self.ops if self.ops else 0.0
+
+    def to_dict(self):
+        return {"entity": self.entity, "backend": self.backend, "rows": self.rows, "operation": self.operation,
+                "ops": self.ops, "seconds": self.seconds, "per_op": self.per_op}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["entity"], data["backend"], data["rows"], data["operation"], data["ops"], data["seconds"])
+
+    def __repr__(self):
+        return (f"BenchmarkResult({self.entity}/{self.backend}, rows={self.rows}, {self.operation}: "
+                f"ops={self.ops}, per_op={self.per_op * 1000:.3f} ms)")
+
+
+def _git_commit():
+    """Текущий коммит репозитория или None, если git недоступен."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(function, ops=1):
+    """Выполнить function ops раз (с номером повтора) и вернуть суммарное время."""
+    started = time.perf_counter()
+    for step in range(ops):
+        function(step)
+    return time.perf_counter() - started
+
+
+class BenchmarkSuite:
+    """Набор замеров операций репозиториев JSON, YAML, двоичного снимка, SQLite и mmap на синтетических данных.
+
+    Для каждой пары (сущность, хранилище) и каждого размера данные генерируются заново
+    в рабочий каталог, после чего замеряются операции из OPERATIONS. Пары, для которых
+    нет репозитория (mmap для водителей и маршрутов), пропускаются.
+    """
+
+    def __init__(self, workdir, sizes=(1000, 10000), backends=BACKENDS, entities=("shipments",),
+                 lookups=1000, pages=100, page_size=50, mutations=10, seed=0):
+        self.workdir = workdir
+        self.sizes = tuple(sizes)
+        self.backends = tuple(backends)
+        self.entities = tuple(entities)
+        self.lookups = lookups
+        self.pages = pages
+        self.page_size = page_size
+        self.mutations = mutations
+        self.seed = seed
+        for backend in self.backends:
+            if backend not in BACKENDS:
+                raise ValueError(f"Неизвестное хранилище {backend}.")
+        for entity in self.entities:
+            if entity not in ENTITIES:
+                raise ValueError(f"Неизвестная сущность {entity}.")
+
+    def _prepare(self, entity, backend, size):
+        """Записать сгенерированные данные в хранилище и вернуть имя его файла."""
+        entity_class, repositories = ENTITIES[entity]
+        filename = os.path.join(self.workdir, f"{entity}_{size}.{'db' if backend == 'sqlite' else backend}")
+        if os.path.exists(filename):
+            os.remove(filename)
+        # Иначе load для YAML измерял бы кэш разобранных документов, а не чтение файла.
+        yaml_cache.clear()
+        rows = generate(entity, size, self.seed)
+        if backend == "json":
+            write_json(filename, rows)
+        elif backend == "yaml":
+            write_yaml(filename, rows)
+        elif backend in ("binary", "mmap"):
+            repository = repositories[backend](filename)
+            repository.entities = [entity_class.from_row(row) for row in rows]
+            repository.save_entities()
+            if backend == "mmap":
+                repository.close()
+        else:
+            repository = repositories[backend](filename)
+            repository.add_entities(entity_class.from_row(row) for row in rows)
+            repository.db_manager.close()
+        return filename
+
+    def run_one(self, entity, backend, size):
+        """Замерить все операции для одной сущности, хранилища и размера."""
+        entity_class, repositories = ENTITIES[entity]
+        rng = random.Random(self.seed)
+        results = []
+
+        def record(operation, ops, seconds):
+            results.append(BenchmarkResult(entity, backend, size, operation, ops, seconds))
+
+        filename = self._prepare(entity, backend, size)
+        repository = None
+
+        def load(step):
+            nonlocal repository
+            repository = repositories[backend](filename)
+
+        # Для SQLite это только открытие соединения и проверка схемы: данные читаются запросами.
+        record("load", 1, _timed(load))
+        record("count", 1, _timed(lambda step: repository.get_count()))
+
+        ids = [rng.randint(1, size) for _ in range(self.lookups)]
+        record("get_by_id", len(ids), _timed(lambda step: repository.get_by_id(ids[step]), len(ids)))
+
+        last_page = max(1, size // self.page_size)
+        pages = [rng.randint(1, last_page) for _ in range(self.pages)]
+        record("paging", len(pages),
+               _timed(lambda step: repository.get_k_n_short_list(pages[step], self.page_size), len(pages)))
+
+        # Во всех хранилищах замеряется одно и то же: первая страница в порядке поля, без изменения
+        # порядка хранения (срез упорядоченного индекса, выбор через кучу или ORDER BY ... LIMIT).
+        field = SORT_KEYS[entity]
+        record("sort", 1, _timed(lambda step: repository.sorted_by(field, 0, self.page_size)))
+
+        new_rows = list(generate(entity, self.mutations, self.seed + 1))
+        record("add", len(new_rows),
+               _timed(lambda step: repository.add_entity(entity_class.from_row(new_rows[step])), len(new_rows)))
+        targets = rng.sample(range(1, size + 1), min(self.mutations, size))
+        record("replace", len(targets), _timed(
+            lambda step: repository.replace_entity_by_id(targets[step], entity_class.from_row(new_rows[step])),
+            len(targets)))
+        record("delete", len(targets),
+               _timed(lambda step: repository.delete_entity_by_id(targets[step]), len(targets)))
+
+        if backend == "sqlite":
+            repository.db_manager.close()
+        elif backend == "mmap":
+            repository.close()
+        return results
+
+    def run(self, progress=None):
+        """Выполнить все замеры. progress(result) вызывается после каждого замера."""
+        os.makedirs(self.workdir, exist_ok=True)
+        results = []
+        for size in self.sizes:
+            for entity in self.entities:
+                for backend in self.backends:
+                    if backend not in ENTITIES[entity][1]:
+                        continue
+                    for result in self.run_one(entity, backend, size):
+                        results.append(result)
+                        if progress is not None:
+                            progress(result)
+        return results
+
+    def metadata(self):
+        """Сведения об окружении и параметрах прогона для сравнения результатов."""
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": self.seed,
+            "lookups": self.lookups,
+            "pages": self.pages,
+            "page_size": self.page_size,
+            "mutations": self.mutations,
+        }
+
+
+def dump_results(file, metadata, results):
+    """Записать результаты прогона в открытый файл в формате JSON."""
+    json.dump({"metadata": metadata, "results": [result.to_dict() for result in results]},
+              file, ensure_ascii=False, indent=2)
+
+
+def save_results(filename, metadata, results):
+    """Сохранить результаты прогона в JSON-файл."""
+    with open(filename, "w", encoding="utf-8") as file:
+        dump_results(file, metadata, results)
+
+
+def load_results(filename):
+    """Прочитать результаты прогона из JSON: пара (метаданные, список BenchmarkResult)."""
+    with open(filename, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    return data["metadata"], [BenchmarkResult.from_dict(item) for item in data["results"]]
+
+
+def compare_results(baseline, current, tolerance=0.2):
+    """Сравнить два прогона по времени одной операции.
+
+    Возвращает список (ключ, время в базовом прогоне, время сейчас, отношение) для замеров,
+    которые стали медленнее более чем на tolerance (0.2 — на 20%).
+    """
+    baseline_by_key = {result.key: result for result in baseline}
+    regressions = []
+    for result in current:
+        previous = baseline_by_key.get(result.key)
+        if previous is None or previous.per_op == 0:
+            continue
+        ratio = result.per_op / previous.per_op
+        if ratio > 1 + tolerance:
+            regressions.append((result.key, previous.per_op, result.per_op, ratio))
+    return regressions
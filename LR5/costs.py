@@ -0,0 +1,117 @@
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+from models import DBRepository
+from shipments import ShipmentsRepositoryMMap
+
+
+class CostSummary:
+    """Сводка стоимости перевозок: число перевозок, оплата водителям и премии."""
+
+    def __init__(self):
+        self.shipments = 0
+        self.payment = 0
+        self.bonus = 0
+
+    def add(self, shipments, payment, bonus):
+        """Учесть группу перевозок."""
+        self.shipments += shipments
+        self.payment += payment
+        self.bonus += bonus
+
+    @property
+    def total(self):
+        """Полная стоимость: оплата водителям плюс премии."""
+        return self.payment + self.bonus
+
+    def __repr__(self):
+        return (f"CostSummary(shipments={self.shipments}, payment={self.payment}, "
+                f"bonus={self.bonus}, total={self.total})")
+
+
+class CostReport:
+    """Стоимость перевозок в разрезе водителей, маршрутов и периодов (ГГГГ-ММ)."""
+
+    def __init__(self):
+        self.by_driver = defaultdict(CostSummary)
+        self.by_route = defaultdict(CostSummary)
+        self.by_period = defaultdict(CostSummary)
+        self.total = CostSummary()
+        # Маршруты, на которые ссылаются перевозки, но которых нет в репозитории.
+        self.missing_routes = set()
+
+    def add(self, driver_id, route_id, period, shipments, payment, bonus):
+        """Учесть группу перевозок одного водителя по одному маршруту за период."""
+        for summary in (self.by_driver[driver_id], self.by_route[route_id],
+                        self.by_period[period], self.total):
+            summary.add(shipments, payment, bonus)
+
+    def __repr__(self):
+        return (f"CostReport(drivers={len(self.by_driver)}, routes={len(self.by_route)}, "
+                f"periods={len(self.by_period)}, total={self.total})")
+
+
+class CostEngine:
+    """Расчёт стоимости перевозок (оплата по маршруту + премия) за один проход по перевозкам."""
+
+    # Период перевозки (ГГГГ-ММ) из даты отправления, хранящейся в формате ГГГГ-ММ-ДД.
+    _PERIOD_SQL = "substr(DepartureDate, 1, 7)"
+
+    def __init__(self, shipments_repository, routes_repository):
+        self.shipments_repository = shipments_repository
+        self.routes_repository = routes_repository
+
+    @staticmethod
+    def _period(value):
+        """Период перевозки (ГГГГ-ММ) по дате в формате ДД.ММ.ГГГГ."""
+        return f"{value[6:10]}-{value[3:5]}"
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _period_from_ordinal(ordinal):
+        """Период перевозки (ГГГГ-ММ) по порядковому номеру дня."""
+        day = date.fromordinal(ordinal)
+        return f"{day.year:04d}-{day.month:02d}"
+
+    def _route_payments(self):
+        """Оплата водителю по каждому маршруту: {ID маршрута: оплата}."""
+        if isinstance(self.routes_repository, DBRepository):
+            cursor = self.routes_repository.db_manager.execute_query("SELECT RouteId, DriverPayment FROM routes")
+            return {route_id: payment for route_id, payment in cursor.fetchall()}
+        return {route.route_id: route.driver_payment for route in self.routes_repository.entities}
+
+    def _shipment_groups(self):
+        """Перевозки, сгруппированные по (водитель, маршрут, период): кортежи с числом и суммой премий."""
+        if isinstance(self.shipments_repository, DBRepository):
+            query = f"""
+                SELECT DriverId, RouteId, {self._PERIOD_SQL} AS Period, COUNT(*), COALESCE(SUM(Bonus), 0)
+                FROM shipments
+                GROUP BY DriverId, RouteId, Period
+            """
+            return self.shipments_repository.db_manager.execute_query(query).fetchall()
+        groups = defaultdict(lambda: [0, 0])
+        if isinstance(self.shipments_repository, ShipmentsRepositoryMMap):
+            # Записи читаются прямо из отображённого файла, без создания объектов Shipment.
+            for _, route_id, driver_id, departure, _, bonus in self.shipments_repository.iter_records():
+                group = groups[driver_id, route_id, self._period_from_ordinal(departure)]
+                group[0] += 1
+                group[1] += bonus
+            return [key + (count, int(bonus) if bonus.is_integer() else bonus)
+                    for key, (count, bonus) in groups.items()]
+        for shipment in self.shipments_repository.entities:
+            group = groups[shipment.driver_id, shipment.route_id, self._period(shipment.departure_date)]
+            group[0] += 1
+            group[1] += shipment.bonus
+        return [key + tuple(values) for key, values in groups.items()]
+
+    def calculate(self):
+        """Рассчитать отчёт о стоимости перевозок."""
+        payments = self._route_payments()
+        report = CostReport()
+        for driver_id, route_id, period, shipments, bonus in self._shipment_groups():
+            payment = payments.get(route_id)
+            if payment is None:
+                report.missing_routes.add(route_id)
+                payment = 0
+            report.add(driver_id, route_id, period, shipments, shipments * payment, bonus)
+        return report
@@ -1,10 +1,28 @@
-from models import MyEntityRepository, DBConnectionManager, Validator
-import json
-import yaml
+from models import (MyEntityRepository, JSONRepository, BinarySnapshotRepository, DBRepository, Validator,
+                    yaml_cache, search_tokens)
+import heapq
+import sqlite3
 
 
 class Driver:
     """Класс Driver с полями из диаграммы и встроенной валидацией."""
+    __slots__ = (
+        "driver_id", "last_name", "first_name", "patronymic", "birthday", "phone_number",
+        "driver_license", "vehicle_title", "insurance_policy", "license_plate", "experience"
+    )
+    # Правила пакетной проверки столбцов (см. Validator.validate_batch).
+    BATCH_RULES = {
+        "last_name": ("string", "Фамилия"),
+        "first_name": ("string", "Имя"),
+        "patronymic": ("string", "Отчество"),
+        "birthday": ("date", "Дата рождения"),
+        "phone_number": ("phone_number", "Номер телефона"),
+        "driver_license": ("license", "Водительское удостоверение"),
+        "vehicle_title": ("license", "ПТС"),
+        "insurance_policy": ("policy", "Страховой полис"),
+        "license_plate": ("license_plate", "Номер машины"),
+        "experience": ("positive_integer", "Стаж"),
+    }
 
     def __init__(self, driver_id=None, last_name=None, first_name=None, patronymic=None, birthday=None,
                  phone_number=None, driver_license=None, vehicle_title=None, insurance_policy=None,
@@ -21,6 +39,38 @@ class Driver:
         self.license_plate = Validator.validate_license_plate(license_plate, "Номер машины")
         self.experience = Validator.validate_positive_integer(experience, "Стаж")
 
+    @classmethod
+    def from_row(cls, row):
+        """Создать водителя из уже проверенных сохранённых данных без повторной валидации."""
+        driver = cls.__new__(cls)
+        driver.driver_id = row["driver_id"]
+        driver.last_name = row["last_name"]
+        driver.first_name = row["first_name"]
+        driver.patronymic = row["patronymic"]
+        driver.birthday = row["birthday"]
+        driver.phone_number = row["phone_number"]
+        driver.driver_license = row["driver_license"]
+        driver.vehicle_title = row["vehicle_title"]
+        driver.insurance_policy = row["insurance_policy"]
+        driver.license_plate = row["license_plate"]
+        driver.experience = row["experience"]
+        return driver
+
+    @classmethod
+    def validate_batch(cls, columns):
+        """Проверить столбцы значений полей водителей без исключений на первой ошибке."""
+        return Validator.validate_batch(columns, cls.BATCH_RULES)
+
+    def to_dict(self):
+        """Поля объекта в виде словаря для сохранения."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def get_id(self):
+        return self.driver_id
+
+    def set_id(self, driver_id):
+        self.driver_id = driver_id
+
     def __repr__(self):
         return (f"Driver(driver_id={self.driver_id}, last_name='{self.last_name}', first_name='{self.first_name}', "
                 f"patronymic='{self.patronymic}', birthday='{self.birthday}', phone_number='{self.phone_number}', "
@@ -44,47 +94,67 @@ class DriverShort:
         return f"{self.last_name} {self.first_name} {self.patronymic}, Стаж: {self.experience} лет"
 
 
-class DriversRepositoryJSON(MyEntityRepository):
+class DriversRepositoryJSON(JSONRepository):
     """Репозиторий для работы с водителями в формате JSON."""
+    entity_class = Driver
+    indexed_fields = ("license_plate",)
+    sorted_fields = ("last_name", "experience")
+    search_fields = ("last_name", "first_name", "patronymic")
 
-    def load_entities(self):
-        """Загрузка данных из JSON-файла."""
-        try:
-            with open(self.filename, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                return [Driver(**entry) for entry in data]
-        except FileNotFoundError:
-            return []
-
-    def save_entities(self):
-        """Сохранение данных в JSON-файл."""
-        with open(self.filename, "w", encoding="utf-8") as file:
-            json.dump([entity.__dict__ for entity in self.entities], file, ensure_ascii=False, indent=4)
 
 class DriversRepositoryYAML(MyEntityRepository):
     """Репозиторий для работы с водителями в формате YAML."""
+    entity_class = Driver
+    indexed_fields = ("license_plate",)
+    sorted_fields = ("last_name", "experience")
+    search_fields = ("last_name", "first_name", "patronymic")
 
     def load_entities(self):
         """Загрузка данных из YAML-файла."""
         try:
-            with open(self.filename, "r", encoding="utf-8") as file:
-                data = yaml.safe_load(file)
-                return [Driver(**entry) for entry in data]
+            data = yaml_cache.load(self.filename)
         except FileNotFoundError:
             return []
+        return [self._hydrate(entry) for entry in data or []]
 
     def save_entities(self):
         """Сохранение данных в YAML-файл."""
-        with open(self.filename, "w", encoding="utf-8") as file:
-            yaml.dump([entity.__dict__ for entity in self.entities], file, allow_unicode=True)
+        yaml_cache.dump(self.filename, [entity.to_dict() for entity in self.entities])
 
 
-class DriversRepositoryDB(MyEntityRepository):
-    """Репозиторий для работы с таблицей drivers в базе данных."""
+class DriversRepositoryBinary(BinarySnapshotRepository):
+    """Репозиторий для работы с водителями в двоичном снимке."""
+    entity_class = Driver
+    indexed_fields = ("license_plate",)
+    sorted_fields = ("last_name", "experience")
+    search_fields = ("last_name", "first_name", "patronymic")
+    record_fields = (
+        ("driver_id", "int"), ("last_name", "str"), ("first_name", "str"), ("patronymic", "str"),
+        ("birthday", "str"), ("phone_number", "str"), ("driver_license", "str"), ("vehicle_title", "str"),
+        ("insurance_policy", "str"), ("license_plate", "str"), ("experience", "int"),
+    )
 
-    def __init__(self, db_name):
-        self.db_manager = DBConnectionManager(db_name)
-        self._initialize_table()
+
+class DriversRepositoryDB(DBRepository):
+    """Репозиторий для работы с таблицей drivers в базе данных."""
+    entity_class = Driver
+    table = "drivers"
+    id_column = "DriverId"
+    columns = {
+        "DriverId": "driver_id", "LastName": "last_name", "FirstName": "first_name",
+        "Patronymic": "patronymic", "Birthday": "birthday", "PhoneNumber": "phone_number",
+        "DriverLicense": "driver_license", "VehicleTitle": "vehicle_title",
+        "InsurancePolicy": "insurance_policy", "LicensePlate": "license_plate", "Experience": "experience",
+    }
+    sortable_columns = ("DriverId", "LastName", "Experience")
+    search_fields = ("last_name", "first_name", "patronymic")
+    _INSERT_QUERY = """INSERT INTO drivers (LastName, FirstName, Patronymic, Birthday, PhoneNumber, 
+                   DriverLicense, VehicleTitle, InsurancePolicy, LicensePlate, Experience) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+    _UPDATE_QUERY = """UPDATE drivers SET LastName = ?, FirstName = ?, Patronymic = ?, Birthday = ?, 
+                   PhoneNumber = ?, DriverLicense = ?, VehicleTitle = ?, InsurancePolicy = ?, 
+                   LicensePlate = ?, Experience = ? WHERE DriverId = ?"""
+    _DELETE_QUERY = "DELETE FROM drivers WHERE DriverId = ?"
 
     def _initialize_table(self):
         """Создание таблицы, если её нет."""
@@ -105,18 +175,83 @@ class DriversRepositoryDB(MyEntityRepository):
         """
         self.db_manager.execute_query(query)
         self.db_manager.commit()
+        self._initialize_search()
 
-    def get_by_id(self, driver_id):
-        """Получить водителя по ID."""
-        query = "SELECT * FROM drivers WHERE DriverId = ?"
-        cursor = self.db_manager.execute_query(query, (driver_id,))
-        result = cursor.fetchone()
-        if result:
-            return Driver(**result)
-        return None
+    def _initialize_search(self):
+        """Создать полнотекстовый индекс FTS5 по ФИО и триггеры, которые поддерживают его актуальным.
 
-    def get_k_n_short_list(self, k, n):
-        """Получить список k по счету n объектов класса Driver."""
+        Если SQLite собрана без FTS5, search() просматривает таблицу целиком.
+        """
+        exists = self.db_manager.execute_query(
+            "SELECT 1 FROM sqlite_master WHERE name = 'drivers_fts'").fetchone() is not None
+        try:
+            self.db_manager.execute_query("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS drivers_fts USING fts5(
+                    LastName, FirstName, Patronymic,
+                    content='drivers', content_rowid='DriverId', tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+            return
+        self.fts_enabled = True
+        # unicode61 не считает «ё» буквой «е» с диакритикой, поэтому «ё» заменяется при индексации.
+        def values(row):
+            return ", ".join(f"replace(replace({row}{column}, 'ё', 'е'), 'Ё', 'Е')"
+                             for column in ("LastName", "FirstName", "Patronymic"))
+
+        for query in (
+            f"""CREATE TRIGGER IF NOT EXISTS drivers_fts_insert AFTER INSERT ON drivers BEGIN
+                    INSERT INTO drivers_fts (rowid, LastName, FirstName, Patronymic)
+                    VALUES (new.DriverId, {values("new.")});
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS drivers_fts_delete AFTER DELETE ON drivers BEGIN
+                    INSERT INTO drivers_fts (drivers_fts, rowid, LastName, FirstName, Patronymic)
+                    VALUES ('delete', old.DriverId, {values("old.")});
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS drivers_fts_update AFTER UPDATE ON drivers BEGIN
+                    INSERT INTO drivers_fts (drivers_fts, rowid, LastName, FirstName, Patronymic)
+                    VALUES ('delete', old.DriverId, {values("old.")});
+                    INSERT INTO drivers_fts (rowid, LastName, FirstName, Patronymic)
+                    VALUES (new.DriverId, {values("new.")});
+                END""",
+        ):
+            self.db_manager.execute_query(query)
+        if not exists:
+            # Индекс по строкам, добавленным до создания триггеров.
+            self.db_manager.execute_query(f"""
+                INSERT INTO drivers_fts (rowid, LastName, FirstName, Patronymic)
+                SELECT DriverId, {values("")} FROM drivers
+            """)
+        self.db_manager.commit()
+
+    def search(self, query, limit=20, lazy=False):
+        """Найти водителей, в ФИО которых есть слова, начинающиеся с каждого слова query.
+
+        Результаты упорядочены по релевантности BM25; совпадение в фамилии весит больше,
+        чем в имени, а в имени — больше, чем в отчестве.
+        """
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        if not self.fts_enabled:
+            matches = (driver for driver in self.iter_all()
+                       if all(any(word.startswith(token) for field in self.search_fields
+                                  for word in search_tokens(getattr(driver, field)))
+                              for token in tokens))
+            return heapq.nsmallest(limit, matches, key=lambda driver: self._search_rank(driver, tokens))
+        columns = ", ".join(f"d.{column}" for column in self.columns)
+        rows = self.db_manager.execute_query(f"""
+            SELECT {columns}
+            FROM drivers_fts JOIN drivers d ON d.DriverId = drivers_fts.rowid
+            WHERE drivers_fts MATCH ?
+            ORDER BY bm25(drivers_fts, 10.0, 5.0, 1.0), d.DriverId
+            LIMIT ?
+        """, (" ".join(f'"{token}"*' for token in tokens), limit)).fetchall()
+        return self._to_results(rows, lazy)
+
+    def get_k_n_short_list(self, k, n, lazy=False):
+        """Получить список k по счету n объектов класса Driver (или LazyRow при lazy=True)."""
         offset = (k - 1) * n
         query = """
             SELECT DriverId, LastName, FirstName, Patronymic, Birthday, PhoneNumber, DriverLicense,
@@ -126,38 +261,16 @@ class DriversRepositoryDB(MyEntityRepository):
         """
         cursor = self.db_manager.execute_query(query, (n, offset))
         results = cursor.fetchall()
-        return [Driver(**dict(row)) for row in results]
+        return self._to_results(results, lazy)
 
-    def add_entity(self, driver):
-        """Добавить водителя в базу данных."""
-        query = """INSERT INTO drivers (LastName, FirstName, Patronymic, Birthday, PhoneNumber, 
-                   DriverLicense, VehicleTitle, InsurancePolicy, LicensePlate, Experience) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-        self.db_manager.execute_query(query, (
+    @staticmethod
+    def _row_params(driver):
+        """Значения столбцов таблицы drivers для объекта Driver."""
+        return (
             driver.last_name, driver.first_name, driver.patronymic, driver.birthday,
             driver.phone_number, driver.driver_license, driver.vehicle_title,
             driver.insurance_policy, driver.license_plate, driver.experience
-        ))
-        self.db_manager.commit()
-
-    def replace_entity_by_id(self, driver_id, updated_driver):
-        """Обновить водителя по ID."""
-        query = """UPDATE drivers SET LastName = ?, FirstName = ?, Patronymic = ?, Birthday = ?, 
-                   PhoneNumber = ?, DriverLicense = ?, VehicleTitle = ?, InsurancePolicy = ?, 
-                   LicensePlate = ?, Experience = ? WHERE DriverId = ?"""
-        self.db_manager.execute_query(query, (
-            updated_driver.last_name, updated_driver.first_name, updated_driver.patronymic,
-            updated_driver.birthday, updated_driver.phone_number, updated_driver.driver_license,
-            updated_driver.vehicle_title, updated_driver.insurance_policy,
-            updated_driver.license_plate, updated_driver.experience, driver_id
-        ))
-        self.db_manager.commit()
-
-    def delete_entity_by_id(self, driver_id):
-        """Удалить водителя по ID."""
-        query = "DELETE FROM drivers WHERE DriverId = ?"
-        self.db_manager.execute_query(query, (driver_id,))
-        self.db_manager.commit()
+        )
 
     def get_count(self):
         """Получить количество водителей."""
@@ -1,13 +1,53 @@
+import atexit
 import os
+import base64
+import hashlib
+import heapq
 import sqlite3
 import re
+import struct
+import sys
+from array import array
 from datetime import datetime
+from functools import lru_cache
 import json
+import threading
+import tempfile
+import time
+import weakref
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from itertools import islice
 import yaml
 
+# Загрузчик и выгрузчик YAML на libyaml, если PyYAML собран с ней, иначе — на чистом Python.
+try:
+    from yaml import CSafeLoader as YAMLLoader, CSafeDumper as YAMLDumper
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader, SafeDumper as YAMLDumper
+
 
 class Validator:
     """Общие методы для проверки данных."""
+    PHONE_PATTERN = re.compile(r"^\+7\(\d{3}\)\d{3}-\d{2}-\d{2}$")
+    LICENSE_PATTERN = re.compile(r"^\d{2} \d{2} \d{6}$")
+    POLICY_PATTERN = re.compile(r"^\d{3} \d{12}$")
+    LICENSE_PLATE_PATTERN = re.compile(r"^[А-Яа-я]\d{3}[А-Яа-я]{2}\d{2,3}$")
+
+    # Правила пакетной проверки: имя правила -> (шаблон, текст ошибки после названия поля).
+    _PATTERN_RULES = {
+        "phone_number": (PHONE_PATTERN, "должен быть в формате +7(XXX)XXX-XX-XX."),
+        "license": (LICENSE_PATTERN, "должен быть в формате 'NN NN NNNNNN'."),
+        "policy": (POLICY_PATTERN, "должен быть в формате 'NNN NNNNNNNNNNN'."),
+        "license_plate": (LICENSE_PLATE_PATTERN, "должен быть в формате 'А111АА111'."),
+    }
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def parse_date(value):
+        """Разобрать дату ДД.ММ.ГГГГ; результаты для повторяющихся дат кэшируются."""
+        return datetime.strptime(value, "%d.%m.%Y")
 
     @staticmethod
     def validate_positive_integer(value, field_name):
@@ -27,40 +67,36 @@ class Validator:
     def validate_date(value, field_name):
         """Проверка и форматирование даты (ДД.ММ.ГГГГ)."""
         try:
-            date_obj = datetime.strptime(value, "%d.%m.%Y")
+            date_obj = Validator.parse_date(value)
             return date_obj.strftime("%d.%m.%Y")
-        except ValueError:
+        except (ValueError, TypeError):
             raise ValueError(f"{field_name} имеет неверный формат даты. Ожидается ДД.ММ.ГГГГ.")
 
     @staticmethod
     def validate_phone_number(value, field_name):
         """Проверка номера телефона с маской +7(XXX)XXX-XX-XX."""
-        phone_pattern = r"^\+7\(\d{3}\)\d{3}-\d{2}-\d{2}$"
-        if not re.match(phone_pattern, value):
+        if not Validator.PHONE_PATTERN.match(value):
             raise ValueError(f"{field_name} должен быть в формате +7(XXX)XXX-XX-XX.")
         return value
 
     @staticmethod
     def validate_license(value, field_name):
         """Проверка лицензий и идентификаторов с форматом 'NN NN NNNNNN'."""
-        license_pattern = r"^\d{2} \d{2} \d{6}$"
-        if not re.match(license_pattern, value):
+        if not Validator.LICENSE_PATTERN.match(value):
             raise ValueError(f"{field_name} должен быть в формате 'NN NN NNNNNN'.")
         return value
 
     @staticmethod
     def validate_policy(value, field_name):
         """Проверка страхового полиса с форматом 'NNN NNNNNNNNNNN'."""
-        policy_pattern = r"^\d{3} \d{12}$"
-        if not re.match(policy_pattern, value):
+        if not Validator.POLICY_PATTERN.match(value):
             raise ValueError(f"{field_name} должен быть в формате 'NNN NNNNNNNNNNN'.")
         return value
 
     @staticmethod
     def validate_license_plate(value, field_name):
         """Проверка номерного знака машины."""
-        license_plate_pattern = r"^[А-Яа-я]\d{3}[А-Яа-я]{2}\d{2,3}$"
-        if not re.match(license_plate_pattern, value):
+        if not Validator.LICENSE_PLATE_PATTERN.match(value):
             raise ValueError(f"{field_name} должен быть в формате 'А111АА111'.")
         return value
 
@@ -75,20 +111,418 @@ class Validator:
     def validate_departure_and_arrival_dates(departure_date, arrival_date):
         """Проверка, что дата отправки не позже даты прибытия."""
         try:
-            dep_date = datetime.strptime(departure_date, "%d.%m.%Y")
-            arr_date = datetime.strptime(arrival_date, "%d.%m.%Y")
+            dep_date = Validator.parse_date(departure_date)
+            arr_date = Validator.parse_date(arrival_date)
             if dep_date > arr_date:
                 raise ValueError("Дата отправки не может быть позже даты прибытия.")
         except ValueError as e:
             raise ValueError(f"Ошибка проверки дат: {e}")
         return departure_date, arrival_date
 
+    @staticmethod
+    def validate_batch(columns, rules):
+        """Пакетная проверка данных, заданных по столбцам.
+
+        columns — {поле: список значений}, rules — {поле: (правило, название поля)}, где правило —
+        одно из "string", "positive_integer", "bonus", "date" или ключ _PATTERN_RULES.
+        Вместо исключения при первой ошибке возвращает BatchValidationReport с
+        очищенными столбцами и ошибками по каждой строке. Если столбца нет или он короче
+        остальных, в недостающих строках значение считается незаданным (None) и тоже
+        попадает в отчёт как ошибка.
+        """
+        report = BatchValidationReport(max(map(len, columns.values()), default=0))
+        for field, (rule, field_name) in rules.items():
+            column = list(columns.get(field, ()))
+            missing = range(len(column), report.row_count)
+            column.extend(None for _ in missing)
+            if rule in Validator._PATTERN_RULES:
+                pattern, message = Validator._PATTERN_RULES[rule]
+                match = pattern.match
+                for row, value in enumerate(column):
+                    if not isinstance(value, str) or not match(value):
+                        report.add_error(row, field, f"{field_name} {message}")
+                report.columns[field] = list(column)
+            elif rule == "date":
+                cleaned = []
+                for row, value in enumerate(column):
+                    try:
+                        cleaned.append(Validator._format_date(value))
+                    except (ValueError, TypeError):
+                        cleaned.append(value)
+                        report.add_error(row, field,
+                                         f"{field_name} имеет неверный формат даты. Ожидается ДД.ММ.ГГГГ.")
+                report.columns[field] = cleaned
+            else:
+                validate = getattr(Validator, f"validate_{rule}")
+                cleaned = []
+                for row, value in enumerate(column):
+                    try:
+                        cleaned.append(validate(value, field_name))
+                    except ValueError as e:
+                        cleaned.append(value)
+                        report.add_error(row, field, str(e))
+                report.columns[field] = cleaned
+            for row in missing:
+                report.add_error(row, field, f"Поле «{field_name}» не задано.")
+        return report
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _format_date(value):
+        """Нормализовать дату ДД.ММ.ГГГГ с кэшированием повторяющихся значений."""
+        return Validator.parse_date(value).strftime("%d.%m.%Y")
+
+
+class BatchValidationReport:
+    """Результат пакетной проверки: очищенные столбцы и ошибки по номерам строк."""
+
+    def __init__(self, row_count):
+        self.row_count = row_count
+        self.columns = {}
+        # {номер строки: {поле: текст ошибки}}
+        self.errors = {}
+
+    def add_error(self, row, field, message):
+        """Зарегистрировать ошибку в поле строки."""
+        self.errors.setdefault(row, {})[field] = message
+
+    @property
+    def valid_rows(self):
+        """Номера строк без ошибок."""
+        return [row for row in range(self.row_count) if row not in self.errors]
+
+    def rows(self):
+        """Строки без ошибок в виде словарей {поле: значение}."""
+        fields = list(self.columns)
+        return [{field: self.columns[field][row] for field in fields} for row in self.valid_rows]
+
+    def __repr__(self):
+        return f"BatchValidationReport(rows={self.row_count}, invalid={len(self.errors)})"
+
+
+def _fsync_directory(directory):
+    """Сбросить на диск запись каталога, чтобы переименование или создание файла в нём пережило сбой."""
+    if not hasattr(os, "O_DIRECTORY"):
+        # На Windows каталог нельзя открыть для fsync; переименование там сохраняет сама ФС.
+        return
+    descriptor = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+@contextmanager
+def atomic_write(filename, mode="w", encoding="utf-8"):
+    """Открыть временный файл рядом с filename и после записи атомарно заменить им filename.
+
+    Данные сбрасываются на диск (fsync) до переименования, а каталог — после него, поэтому
+    после сбоя на месте filename остаётся либо прежний, либо новый файл целиком, а читатели
+    никогда не видят файл, записанный наполовину.
+    """
+    directory, name = os.path.split(os.path.abspath(filename))
+    descriptor, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(descriptor, mode, encoding=None if "b" in mode else encoding) as file:
+            # mkstemp создаёт файл с правами 0600: переносим права заменяемого файла.
+            os.chmod(temporary, os.stat(filename).st_mode & 0o7777 if os.path.exists(filename) else 0o644)
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    _fsync_directory(directory)
+
+
+class YAMLDocumentCache:
+    """Кэш разобранных YAML-документов по имени файла.
+
+    Запись действительна, пока не изменились mtime, размер и inode файла; если они изменились,
+    а содержимое (хеш) осталось прежним, документ тоже не разбирается заново.
+    Возвращаемые документы общие для всех читателей и не должны изменяться.
+    """
+
+    def __init__(self, max_size=8):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    @staticmethod
+    def _version(stat):
+        # atomic_write всегда создаёт новый inode, поэтому перезапись файла тем же по размеру
+        # содержимым в пределах точности mtime отличается хотя бы по st_ino.
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _store(self, filename, stat, digest, document):
+        with self._lock:
+            self._entries[filename] = (self._version(stat), digest, document)
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def load(self, filename):
+        """Разобранный документ из файла; FileNotFoundError, если файла нет."""
+        filename = os.path.abspath(filename)
+        with open(filename, "rb") as file:
+            # Версия берётся у открытого файла, а не по имени: если файл заменят после
+            # открытия, в кэш попадёт версия именно того содержимого, которое прочитано.
+            stat = os.fstat(file.fileno())
+            with self._lock:
+                entry = self._entries.get(filename)
+            if entry is not None and entry[0] == self._version(stat):
+                return entry[2]
+            data = file.read()
+        digest = self._digest(data)
+        if entry is not None and entry[1] == digest:
+            document = entry[2]
+        else:
+            document = yaml.load(data, Loader=YAMLLoader)
+        self._store(filename, stat, digest, document)
+        return document
+
+    def dump(self, filename, document):
+        """Атомарно записать документ в файл и сразу положить его в кэш."""
+        data = yaml.dump(document, Dumper=YAMLDumper, allow_unicode=True).encode("utf-8")
+        with atomic_write(filename, "wb") as file:
+            file.write(data)
+            file.flush()
+            stat = os.fstat(file.fileno())
+        self._store(os.path.abspath(filename), stat, self._digest(data), document)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+yaml_cache = YAMLDocumentCache()
+
+
+_WORD = re.compile(r"\w+")
+
+
+def search_tokens(text):
+    """Слова строки для поиска: в нижнем регистре, «ё» приравнена к «е». У незаданного поля (None) слов нет."""
+    if text is None:
+        return []
+    return _WORD.findall(str(text).lower().replace("ё", "е"))
+
+
+class PrefixTrie:
+    """Префиксное дерево слов: для каждого слова хранится множество объектов, в которых оно встречается."""
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, word, item):
+        node = self._root
+        for char in word:
+            node = node.setdefault(char, {})
+        # Ключ None в узле — множество объектов слова, которое заканчивается в этом узле.
+        node.setdefault(None, set()).add(item)
+
+    def discard(self, word, item):
+        """Удалить объект из слова и убрать опустевшие узлы."""
+        path = [self._root]
+        for char in word:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        items = path[-1].get(None)
+        if items is None:
+            return
+        items.discard(item)
+        if not items:
+            del path[-1][None]
+        for char, parent, node in zip(reversed(word), reversed(path[:-1]), reversed(path[1:])):
+            if node:
+                break
+            del parent[char]
+
+    def find(self, prefix):
+        """Множество объектов всех слов, начинающихся с prefix."""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        found = set()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    found |= child
+                else:
+                    stack.append(child)
+        return found
+
+
+def to_iso_date(value):
+    """Перевести дату из формата ДД.ММ.ГГГГ в сортируемый формат ГГГГ-ММ-ДД."""
+    return f"{value[6:10]}-{value[3:5]}-{value[0:2]}"
+
+
+def from_iso_date(value):
+    """Перевести дату из формата ГГГГ-ММ-ДД в формат ДД.ММ.ГГГГ."""
+    return f"{value[8:10]}.{value[5:7]}.{value[0:4]}"
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    """Поэлементно прочитать JSON-массив верхнего уровня, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def skip_whitespace():
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+    def expect(symbols):
+        skip_whitespace()
+        if position >= len(buffer) or buffer[position] not in symbols:
+            raise ValueError(f"Ожидался один из символов {symbols!r} в позиции {position} JSON-массива.")
+        return buffer[position]
+
+    expect("[")
+    position += 1
+    skip_whitespace()
+    if position < len(buffer) and buffer[position] == "]":
+        return
+    while True:
+        skip_whitespace()
+        while True:
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # Число на границе буфера может быть обрезано, поэтому элемент принимается,
+            # только если за ним уже виден разделитель.
+            if end is not None and (eof or (end < len(buffer) and buffer[end] in " \t\r\n,]")):
+                break
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+        position = end
+        yield element
+        separator = expect(",]")
+        position += 1
+        if separator == "]":
+            return
+
+
+# Репозитории с отложенной записью, которые сбрасываются на диск при завершении интерпретатора.
+_write_behind_repositories = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_write_behind_repositories():
+    for repository in list(_write_behind_repositories):
+        repository.flush()
+
 
 class MyEntityRepository:
     """Базовый класс репозитория."""
-    def __init__(self, filename):
+    # Класс объектов репозитория, нужен для восстановления записей журнала.
+    entity_class = None
+    # Поля, по которым строятся вторичные индексы (значение -> объекты).
+    indexed_fields = ()
+    # Поля для поиска search() по префиксам слов в порядке убывания веса.
+    search_fields = ()
+    # Поля с упорядоченным индексом для запросов по диапазону: {поле: функция ключа сортировки}.
+    range_indexed_fields = {}
+    # Поля, для которых поддерживается упорядоченный индекс для sorted_by и top_k
+    # (поля из range_indexed_fields упорядочены всегда).
+    sorted_fields = ()
+    # Число записей журнала, после которого выполняется сжатие.
+    journal_threshold = 1000
+    # Отложенная запись: через сколько секунд после первого изменения и после скольких
+    # изменений несохранённые изменения сбрасываются на диск.
+    flush_interval = 1.0
+    flush_threshold = 1000
+    # Проверять ли данные валидатором при чтении из собственного хранилища (режим аудита).
+    verify_on_read = False
+
+    def __init__(self, filename, indexed_fields=None, journal=False, verify_on_read=None, write_behind=False,
+                 sorted_fields=None):
         self.filename = filename
+        self.journal = journal
+        self.write_behind = write_behind
+        self._init_write_state()
+        if verify_on_read is not None:
+            self.verify_on_read = verify_on_read
+        self.journal_filename = f"{filename}.journal"
+        self._journal_size = 0
+        if indexed_fields is not None:
+            self.indexed_fields = tuple(indexed_fields)
+        if sorted_fields is not None:
+            self.sorted_fields = tuple(sorted_fields)
+        self._load()
+
+    def _init_write_state(self):
+        """Блокировка изменений и состояние отложенной записи, общие для всех хранилищ."""
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._flush_timer = None
+        # Число несохранённых изменений и, в режиме журнала, их записи.
+        self._pending = 0
+        self._pending_records = []
+
+    def _load(self):
+        """Прочитать снимок и журнал и построить индексы."""
+        # Версия берётся до чтения: изменение файла во время загрузки будет замечено is_stale().
+        self._version = self._file_version()
         self.entities = self.load_entities()
+        if self.journal:
+            self._replay_journal()
+        self._rebuild_indexes()
+
+    def _file_version(self):
+        """Версия данных на диске: (mtime, размер, inode) файла и журнала."""
+        version = []
+        for filename in (self.filename, self.journal_filename):
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                version.append(None)
+            else:
+                version.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        return tuple(version)
+
+    def is_stale(self):
+        """Изменился ли файл на диске после того, как репозиторий его прочитал или записал."""
+        return self._file_version() != self._version
+
+    def refresh(self):
+        """Перечитать файл, если его изменил другой процесс. Возвращает True, если данные перечитаны."""
+        with self._lock:
+            if not self.is_stale():
+                return False
+            if self._pending:
+                raise ValueError("Есть несохранённые изменения: перед refresh() нужно вызвать flush().")
+            self._load()
+            return True
+
+    def _save(self):
+        """Сохранить снимок и запомнить версию записанного файла."""
+        self.save_entities()
+        self._version = self._file_version()
 
     def load_entities(self):
         """Загрузить данные из файла. Реализовать в дочерних классах."""
@@ -98,12 +532,293 @@ class MyEntityRepository:
         """Сохранить данные в файл. Реализовать в дочерних классах."""
         raise NotImplementedError("Метод save_entities должен быть реализован в дочернем классе.")
 
+    def _replay_journal(self):
+        """Применить к загруженному снимку изменения из журнала.
+
+        Последняя запись, оборванная сбоем во время дозаписи (без перевода строки или
+        с неполным JSON), отбрасывается, а журнал обрезается до конца последней целой
+        записи: иначе следующая дозапись склеилась бы с оборванной строкой.
+        """
+        try:
+            with open(self.journal_filename, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return
+        records = []
+        offset = 0
+        while offset < len(data):
+            end = data.find(b"\n", offset)
+            torn = end < 0
+            if not torn and data[offset:end].strip():
+                try:
+                    records.append(json.loads(data[offset:end]))
+                except ValueError:
+                    if data[end + 1:].strip():
+                        raise
+                    torn = True
+            if torn:
+                with open(self.journal_filename, "r+b") as file:
+                    file.truncate(offset)
+                self._version = self._file_version()
+                break
+            offset = end + 1
+        entities_by_id = {entity.get_id(): entity for entity in self.entities}
+        for record in records:
+            if record["op"] == "delete":
+                entities_by_id.pop(record["id"], None)
+            else:
+                entities_by_id[record["id"]] = self._hydrate(record["entity"])
+        self.entities = list(entities_by_id.values())
+        self._journal_size = len(records)
+
+    def _hydrate(self, values):
+        """Создать объект из данных хранилища: без проверки или с проверкой в режиме аудита."""
+        if self.verify_on_read:
+            return self.entity_class(**values)
+        return self.entity_class.from_row(values)
+
+    def _persist(self, operation, entity_id, entity=None):
+        """Сохранить изменение: целиком в файл или одной записью в журнал.
+
+        В режиме отложенной записи и внутри batch() изменение только запоминается
+        и попадает на диск при следующем flush().
+        """
+        record = None
+        if self.journal:
+            record = {"op": operation, "id": entity_id}
+            if entity is not None:
+                record["entity"] = entity.to_dict()
+        if not self.write_behind and not self._batch_depth:
+            if record is None:
+                self._save()
+            else:
+                self._append_journal([record])
+            return
+        self._pending += 1
+        if record is not None:
+            self._pending_records.append(record)
+        _write_behind_repositories.add(self)
+        if self._pending >= self.flush_threshold:
+            self.flush()
+        elif self.write_behind and self._flush_timer is None and not self._batch_depth:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _append_journal(self, records):
+        """Дописать записи в журнал одной операцией записи.
+
+        Запись сбрасывается на диск (fsync) до возврата, поэтому подтверждённое изменение
+        переживает сбой; в режиме write_behind или внутри batch() подтверждением служит flush().
+        """
+        created = not os.path.exists(self.journal_filename)
+        with open(self.journal_filename, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+            file.flush()
+            os.fsync(file.fileno())
+        if created:
+            _fsync_directory(os.path.dirname(os.path.abspath(self.journal_filename)))
+        self._version = self._file_version()
+        self._journal_size += len(records)
+        if self._journal_size >= self.journal_threshold:
+            self.compact()
+
+    def _reset_pending(self):
+        """Забыть отложенные изменения и остановить таймер сброса."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        self._pending = 0
+        self._pending_records = []
+
+    def flush(self):
+        """Записать на диск изменения, отложенные в режиме write_behind или внутри batch()."""
+        with self._lock:
+            if not self._pending:
+                self._reset_pending()
+                return
+            records = self._pending_records
+            self._reset_pending()
+            if self.journal:
+                self._append_journal(records)
+            else:
+                self._save()
+
+    @contextmanager
+    def batch(self):
+        """Контекст, внутри которого изменения накапливаются и записываются одним flush() при выходе."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self.flush()
+
+    def compact(self):
+        """Записать текущий снимок в файл и очистить журнал."""
+        with self._lock:
+            self._reset_pending()
+            self.save_entities()
+            if os.path.exists(self.journal_filename):
+                os.remove(self.journal_filename)
+            self._version = self._file_version()
+            self._journal_size = 0
+
+    def _rebuild_indexes(self):
+        """Построить заново хеш-индекс по ID и вторичные индексы."""
+        self._id_index = {}
+        self._positions = {}
+        self._secondary = {field: {} for field in self.indexed_fields}
+        self._trie = PrefixTrie() if self.search_fields else None
+        self._ranges = {}
+        self._last_id = 0
+        for position, entity in enumerate(self.entities):
+            self._positions[entity.get_id()] = position
+            self._index_add(entity)
+        self._sort_keys = dict.fromkeys(self.sorted_fields)
+        self._sort_keys.update(self.range_indexed_fields)
+        self._ranges = {
+            field: sorted((self._range_key(field, entity), entity.get_id()) for entity in self.entities)
+            for field in self._sort_keys
+        }
+
+    def _range_key(self, field, entity):
+        """Ключ упорядоченного индекса для значения поля объекта."""
+        key = self._sort_keys[field]
+        value = getattr(entity, field)
+        return key(value) if key is not None else value
+
+    def _index_add(self, entity):
+        """Добавить объект во все индексы."""
+        entity_id = entity.get_id()
+        self._id_index[entity_id] = entity
+        if entity_id is not None and entity_id > self._last_id:
+            self._last_id = entity_id
+        for field, index in self._secondary.items():
+            index.setdefault(getattr(entity, field), {})[entity_id] = entity
+        for field, ordered in self._ranges.items():
+            insort(ordered, (self._range_key(field, entity), entity_id))
+        if self._trie is not None:
+            for field in self.search_fields:
+                for word in search_tokens(getattr(entity, field)):
+                    self._trie.add(word, entity_id)
+
+    def _index_remove(self, entity):
+        """Удалить объект из всех индексов."""
+        entity_id = entity.get_id()
+        self._id_index.pop(entity_id, None)
+        for field, index in self._secondary.items():
+            value = getattr(entity, field)
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.pop(entity_id, None)
+                if not bucket:
+                    del index[value]
+        for field, ordered in self._ranges.items():
+            item = (self._range_key(field, entity), entity_id)
+            position = bisect_left(ordered, item)
+            if position < len(ordered) and ordered[position] == item:
+                del ordered[position]
+        if self._trie is not None:
+            for field in self.search_fields:
+                for word in search_tokens(getattr(entity, field)):
+                    self._trie.discard(word, entity_id)
+
     def get_by_id(self, entity_id):
         """Получить объект по ID."""
-        for entity in self.entities:
-            if entity.get_id() == entity_id:
-                return entity
-        return None
+        return self._id_index.get(entity_id)
+
+    def search(self, query, limit=20):
+        """Найти объекты, в полях search_fields которых есть слова, начинающиеся с каждого слова query.
+
+        Результаты упорядочены по релевантности: точное совпадение слова весит больше
+        совпадения по префиксу, а поле тем важнее, чем раньше оно указано в search_fields.
+        """
+        if self._trie is None:
+            raise ValueError(f"Для {type(self).__name__} не заданы поля поиска.")
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        candidates = None
+        for token in tokens:
+            found = self._trie.find(token)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+        ranked = heapq.nsmallest(limit, candidates,
+                                 key=lambda entity_id: self._search_rank(self._id_index[entity_id], tokens))
+        return [self._id_index[entity_id] for entity_id in ranked]
+
+    def _search_rank(self, entity, tokens):
+        """Ключ сортировки результатов поиска: чем меньше, тем выше объект в выдаче."""
+        weights = range(len(self.search_fields), 0, -1)
+        words = [(weight, search_tokens(getattr(entity, field)))
+                 for weight, field in zip(weights, self.search_fields)]
+        score = 0
+        for token in tokens:
+            score += max((weight * (2 if word == token else 1)
+                          for weight, field_words in words for word in field_words if word.startswith(token)),
+                         default=0)
+        return -score, entity.get_id()
+
+    def find_by_field(self, field, value):
+        """Получить список объектов, у которых поле field равно value."""
+        index = self._secondary.get(field)
+        if index is not None:
+            return list(index.get(value, {}).values())
+        if self.entities and not hasattr(self.entities[0], field):
+            raise ValueError(f"Поле {field} не существует в классе {type(self.entities[0]).__name__}.")
+        return [entity for entity in self.entities if getattr(entity, field) == value]
+
+    def find_in_range(self, field, low, high):
+        """Получить объекты, у которых значение поля field лежит в [low, high], в порядке поля."""
+        if field not in self._ranges:
+            raise ValueError(f"Для поля {field} нет упорядоченного индекса.")
+        key = self._sort_keys[field] or (lambda value: value)
+        ordered = self._ranges[field]
+        start = bisect_left(ordered, (key(low),))
+        end = bisect_right(ordered, (key(high), float("inf")))
+        return [self._id_index[entity_id] for _, entity_id in ordered[start:end]]
+
+    def _sort_key(self, field):
+        """Функция ключа сортировки объектов по полю field."""
+        if self.entities and not hasattr(self.entities[0], field):
+            raise ValueError(f"Поле {field} не существует в классе {type(self.entities[0]).__name__}.")
+        key = self._sort_keys.get(field) if field in self._ranges else None
+        if key is None:
+            return lambda entity: getattr(entity, field)
+        return lambda entity: key(getattr(entity, field))
+
+    def sorted_by(self, field, offset=0, limit=None, reverse=False):
+        """Получить limit объектов начиная с offset в порядке поля field, не меняя порядок хранения.
+
+        По полям с упорядоченным индексом это срез индекса; по остальным — выбор
+        offset + limit первых объектов через кучу (или полная сортировка без limit).
+        """
+        ordered = self._ranges.get(field)
+        if ordered is not None:
+            if reverse:
+                stop = len(ordered) - offset
+                start = 0 if limit is None else max(stop - limit, 0)
+                window = reversed(ordered[start:max(stop, 0)])
+            else:
+                window = ordered[offset:None if limit is None else offset + limit]
+            return [self._id_index[entity_id] for _, entity_id in window]
+        key = self._sort_key(field)
+        if limit is None:
+            return sorted(self.entities, key=key, reverse=reverse)[offset:]
+        select = heapq.nlargest if reverse else heapq.nsmallest
+        return select(offset + limit, self.entities, key=key)[offset:]
+
+    def top_k(self, field, k, largest=True):
+        """Получить k объектов с наибольшими (largest=False — наименьшими) значениями поля field."""
+        if field in self._ranges:
+            return self.sorted_by(field, 0, k, reverse=largest)
+        select = heapq.nlargest if largest else heapq.nsmallest
+        return select(k, self.entities, key=self._sort_key(field))
 
     def get_k_n_short_list(self, k, n):
         """Получить список k по счету n объектов."""
@@ -112,72 +827,807 @@ class MyEntityRepository:
         return self.entities[start_index:end_index]
 
     def sort_by_field(self, field):
-        """Сортировать элементы по выбранному полю."""
-        if hasattr(self.entities[0], field):
-            self.entities.sort(key=lambda x: getattr(x, field))
-        else:
-            raise ValueError(f"Поле {field} не существует в классе {type(self.entities[0]).__name__}.")
+        """Сортировать элементы по выбранному полю (меняет порядок хранения; без этого — sorted_by)."""
+        with self._lock:
+            if hasattr(self.entities[0], field):
+                self.entities.sort(key=lambda x: getattr(x, field))
+                self._positions = {entity.get_id(): position for position, entity in enumerate(self.entities)}
+            else:
+                raise ValueError(f"Поле {field} не существует в классе {type(self.entities[0]).__name__}.")
 
     def add_entity(self, entity):
-        """Добавить объект в список с новым ID."""
-        new_id = max([e.get_id() for e in self.entities], default=0) + 1
-        entity.set_id(new_id)
-        self.entities.append(entity)
-        self.save_entities()
+        """Добавить объект в список с новым ID (максимальный ID в репозитории плюс один)."""
+        with self._lock:
+            new_id = self._last_id + 1
+            entity.set_id(new_id)
+            self._positions[new_id] = len(self.entities)
+            self.entities.append(entity)
+            self._index_add(entity)
+            self._persist("add", new_id, entity)
 
     def replace_entity_by_id(self, entity_id, updated_entity):
         """Заменить элемент списка по ID."""
-        for index, entity in enumerate(self.entities):
-            if entity.get_id() == entity_id:
-                updated_entity.set_id(entity_id)
-                self.entities[index] = updated_entity
-                self.save_entities()
-                return
-        raise ValueError(f"Объект с ID {entity_id} не найден.")
+        with self._lock:
+            position = self._positions.get(entity_id)
+            if position is None:
+                raise ValueError(f"Объект с ID {entity_id} не найден.")
+            self._index_remove(self.entities[position])
+            updated_entity.set_id(entity_id)
+            self.entities[position] = updated_entity
+            self._index_add(updated_entity)
+            self._persist("replace", entity_id, updated_entity)
 
     def delete_entity_by_id(self, entity_id):
         """Удалить элемент списка по ID."""
-        self.entities = [entity for entity in self.entities if entity.get_id() != entity_id]
-        self.save_entities()
+        with self._lock:
+            position = self._positions.pop(entity_id, None)
+            if position is not None:
+                self._index_remove(self.entities.pop(position))
+                for shifted in self.entities[position:]:
+                    self._positions[shifted.get_id()] = position
+                    position += 1
+                if entity_id == self._last_id:
+                    # Новый ID — максимальный из оставшихся плюс один, как и после повторного открытия.
+                    self._last_id = max((item for item in self._id_index if item is not None), default=0)
+            self._persist("delete", entity_id)
 
     def get_count(self):
         """Получить количество элементов."""
         return len(self.entities)
 
 
+class JSONRepository(MyEntityRepository):
+    """Репозиторий, хранящий объекты JSON-массивом в файле."""
+
+    @classmethod
+    def iter_file(cls, filename, verify_on_read=None):
+        """Потоково читать объекты из JSON-файла по одному, не создавая репозиторий.
+
+        Файл не загружается целиком и индексы не строятся, поэтому выгрузки, отчёты и
+        миграции по большим файлам идут в ограниченной памяти. Журнал не применяется:
+        читается только снимок.
+        """
+        verify = cls.verify_on_read if verify_on_read is None else verify_on_read
+        try:
+            file = open(filename, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with file:
+            for entry in iter_json_array(file):
+                yield cls.entity_class(**entry) if verify else cls.entity_class.from_row(entry)
+
+    def iter_entities(self):
+        """Потоково читать объекты из JSON-файла репозитория по одному."""
+        return self.iter_file(self.filename, self.verify_on_read)
+
+    def load_entities(self):
+        """Загрузка данных из JSON-файла."""
+        return list(self.iter_entities())
+
+    def save_entities(self):
+        """Сохранение данных в JSON-файл."""
+        with atomic_write(self.filename) as file:
+            json.dump([entity.to_dict() for entity in self.entities], file, ensure_ascii=False, indent=4)
+
+
+class BinarySnapshotRepository(MyEntityRepository):
+    """Репозиторий, хранящий снимок объектов в компактном двоичном файле.
+
+    Файл состоит из заголовка, записей фиксированной длины и таблицы строк.
+    Числа упаковываются в записи как есть, строки — как номера в таблице строк,
+    где каждая различная строка хранится один раз. Файл читается одним вызовом
+    read(), записи распаковываются struct.iter_unpack без разбора текста.
+    """
+    # Поля записи: кортежи (поле, тип), тип — "int", "float" или "str".
+    record_fields = ()
+
+    MAGIC = b"LR5B"
+    VERSION = 1
+    # Сигнатура, версия, длина записи, число записей, число строк, длина таблицы строк в байтах.
+    HEADER = struct.Struct("<4sHHQII")
+    _FORMATS = {"int": "q", "float": "d", "str": "I"}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.record_fields:
+            cls._record = struct.Struct("<" + "".join(cls._FORMATS[kind] for _, kind in cls.record_fields))
+
+    def load_entities(self):
+        """Загрузка снимка одним чтением файла."""
+        try:
+            with open(self.filename, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return []
+        magic, version, record_size, count, string_count, strings_size = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION or record_size != self._record.size:
+            raise ValueError(f"Файл {self.filename} не является снимком {type(self).__name__}.")
+        view = memoryview(data)
+        records_start = self.HEADER.size
+        offsets_start = records_start + count * record_size
+        blob_start = offsets_start + (string_count + 1) * 4
+        offsets = array("I")
+        offsets.frombytes(view[offsets_start:blob_start])
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        blob = data[blob_start:blob_start + strings_size]
+        strings = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(string_count)]
+
+        names = [field for field, _ in self.record_fields]
+        string_positions = [position for position, (_, kind) in enumerate(self.record_fields) if kind == "str"]
+        float_positions = [position for position, (_, kind) in enumerate(self.record_fields) if kind == "float"]
+        entities = []
+        for values in self._record.iter_unpack(view[records_start:offsets_start]):
+            values = list(values)
+            for position in string_positions:
+                values[position] = strings[values[position]]
+            for position in float_positions:
+                if values[position].is_integer():
+                    values[position] = int(values[position])
+            entities.append(self._hydrate(dict(zip(names, values))))
+        return entities
+
+    def save_entities(self):
+        """Сохранение снимка: записи фиксированной длины и таблица строк."""
+        string_ids = {}
+        records = bytearray(len(self.entities) * self._record.size)
+        for position, entity in enumerate(self.entities):
+            values = []
+            for field, kind in self.record_fields:
+                value = getattr(entity, field)
+                if value is None:
+                    # В записях фиксированной длины нет пустых значений: объект без ID
+                    # (или без другого поля) нужно сначала добавить через add_entity.
+                    raise ValueError(f"Поле {field} объекта {type(entity).__name__} не задано: "
+                                     f"его нельзя сохранить в снимок.")
+                if kind == "str":
+                    value = string_ids.setdefault(value, len(string_ids))
+                values.append(value)
+            self._record.pack_into(records, position * self._record.size, *values)
+        encoded = [string.encode("utf-8") for string in string_ids]
+        offsets = array("I", [0])
+        for string in encoded:
+            offsets.append(offsets[-1] + len(string))
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        blob = b"".join(encoded)
+        with atomic_write(self.filename, "wb") as file:
+            file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self._record.size, len(self.entities),
+                                        len(encoded), len(blob)))
+            file.write(records)
+            file.write(offsets.tobytes())
+            file.write(blob)
+
+
+def convert_repository(source, target):
+    """Записать все объекты репозитория source в хранилище target (например, JSON -> снимок)."""
+    target.entities = list(source.entities)
+    target._rebuild_indexes()
+    target.compact()
+    return target
+
+
+class LazyRow:
+    """Лёгкое представление строки sqlite3.Row с доступом по именам полей объекта.
+
+    Значения читаются из строки при обращении; объект предметной области
+    создаётся только при вызове to_entity().
+    """
+    __slots__ = ("_repository", "_row")
+
+    def __init__(self, repository, row):
+        self._repository = repository
+        self._row = row
+
+    def __getattr__(self, name):
+        column = self._repository.fields.get(name)
+        if column is None:
+            raise AttributeError(f"Поле {name} не существует в таблице {self._repository.table}.")
+        value = self._row[column]
+        if column in self._repository.date_columns:
+            value = from_iso_date(value)
+        return value
+
+    def get_id(self):
+        return self._row[self._repository.id_column]
+
+    def to_dict(self):
+        """Поля строки в виде словаря {поле объекта: значение}."""
+        return {field: getattr(self, field) for field in self._repository.fields}
+
+    def to_entity(self):
+        """Создать объект предметной области из строки."""
+        return self._repository._to_entity(self._row)
+
+    def __repr__(self):
+        return f"LazyRow({self._repository.table}, {self.to_dict()})"
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш с вытеснением давно не использованных записей и счётчиками попаданий."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Значение по ключу или None, если его нет в кэше."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self.max_size <= 0:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Удалить запись по ключу."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        """Доля попаданий среди всех обращений."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return (f"LRUCache(size={len(self)}/{self.max_size}, hits={self.hits}, misses={self.misses}, "
+                f"hit_rate={self.hit_rate:.2%})")
+
+
+class DBRepository(MyEntityRepository):
+    """Базовый класс репозитория, хранящего объекты в таблице SQLite."""
+    entity_class = None
+    table = None
+    id_column = None
+    # Соответствие столбцов таблицы полям объекта.
+    columns = {}
+    # Столбцы, по которым доступна постраничная выборка с курсором.
+    sortable_columns = ()
+    # Столбцы с датами, которые хранятся в сортируемом формате ГГГГ-ММ-ДД.
+    date_columns = ()
+    # Число строк в кэше get_by_id (0 — без кэша).
+    cache_size = 1024
+    # Наибольшее число параметров в одном запросе get_many.
+    max_query_params = 900
+    # Запросы вставки, обновления и удаления строки; параметры строит _row_params (_insert_params).
+    _INSERT_QUERY = _UPDATE_QUERY = _DELETE_QUERY = None
+
+    def __init__(self, db_name, verify_on_read=None, cache_size=None):
+        if verify_on_read is not None:
+            self.verify_on_read = verify_on_read
+        # Изменения пишутся в таблицу сразу: batch() и flush() ничего не откладывают.
+        self.journal = self.write_behind = False
+        self._init_write_state()
+        # Кэш строк таблицы по ID. Изменения через этот репозиторий сбрасывают записи кэша,
+        # изменения таблицы в обход него (другие репозитории, процессы) — нет.
+        self.cache = LRUCache(self.cache_size if cache_size is None else cache_size)
+        # Обратное соответствие: поле объекта -> столбец таблицы.
+        self.fields = {field: column for column, field in self.columns.items()}
+        self.db_manager = DBConnectionManager(db_name)
+        self._initialize_table()
+        self._create_sort_indexes()
+
+    def _initialize_table(self):
+        """Создать таблицу. Реализовать в дочерних классах."""
+        raise NotImplementedError("Метод _initialize_table должен быть реализован в дочернем классе.")
+
+    def _create_sort_indexes(self):
+        """Создать индексы (столбец, ID) для сортируемых столбцов."""
+        for column in self.sortable_columns:
+            if column != self.id_column:
+                self.db_manager.execute_query(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{column.lower()} "
+                    f"ON {self.table} ({column}, {self.id_column})"
+                )
+        self.db_manager.commit()
+
+    def _to_entity(self, row):
+        """Создать объект из строки таблицы."""
+        values = {field: row[column] for column, field in self.columns.items()}
+        for column in self.date_columns:
+            values[self.columns[column]] = from_iso_date(values[self.columns[column]])
+        return self._hydrate(values)
+
+    @contextmanager
+    def _invalidating(self, entity_ids):
+        """Сбросить записи кэша entity_ids до изменения таблицы и после его фиксации.
+
+        Второй сброс нужен потому, что другой поток может прочитать в кэш старую
+        строку, пока изменение ещё не зафиксировано.
+        """
+        self.cache.invalidate_many(entity_ids)
+        try:
+            yield
+        finally:
+            self.cache.invalidate_many(entity_ids)
+
+    @staticmethod
+    def _chunk_ids(chunks):
+        """ID строк, вставленных пачками (число строк, rowid последней строки)."""
+        return [entity_id for rows, last_id in chunks for entity_id in range(last_id - rows + 1, last_id + 1)]
+
+    @staticmethod
+    def _row_params(entity):
+        """Значения столбцов таблицы для объекта (без ID). Реализовать в дочерних классах."""
+        raise NotImplementedError("Метод _row_params должен быть реализован в дочернем классе.")
+
+    def _insert_params(self, entity):
+        """Значения столбцов для вставки объекта; по умолчанию — те же, что и _row_params."""
+        return self._row_params(entity)
+
+    def add_entity(self, entity):
+        """Добавить объект в таблицу."""
+        self.db_manager.execute_query(self._INSERT_QUERY, self._insert_params(entity))
+        self.db_manager.commit()
+
+    def replace_entity_by_id(self, entity_id, updated_entity):
+        """Обновить объект по ID."""
+        with self._invalidating((entity_id,)):
+            self.db_manager.execute_query(self._UPDATE_QUERY, self._row_params(updated_entity) + (entity_id,))
+            self.db_manager.commit()
+
+    def delete_entity_by_id(self, entity_id):
+        """Удалить объект по ID."""
+        with self._invalidating((entity_id,)):
+            self.db_manager.execute_query(self._DELETE_QUERY, (entity_id,))
+            self.db_manager.commit()
+
+    def add_entities(self, entities, chunk_size=10000, on_chunk=None):
+        """Добавить объекты пачками. Возвращает список присвоенных ID.
+
+        Если пачка не вставилась, ID уже зафиксированных пачек передаются в атрибуте
+        committed_ids исключения.
+        """
+        try:
+            chunks = self.db_manager.execute_many_chunked(
+                self._INSERT_QUERY, (self._insert_params(item) for item in entities), chunk_size, on_chunk
+            )
+        except Exception as error:
+            error.committed_ids = self._chunk_ids(getattr(error, "committed_chunks", ()))
+            raise
+        return self._chunk_ids(chunks)
+
+    def replace_entities(self, entities_by_id, chunk_size=10000, on_chunk=None):
+        """Обновить объекты пачками по словарю {ID: объект}."""
+        with self._invalidating(entities_by_id):
+            self.db_manager.execute_many_chunked(
+                self._UPDATE_QUERY,
+                (self._row_params(item) + (item_id,) for item_id, item in entities_by_id.items()),
+                chunk_size, on_chunk
+            )
+
+    def delete_entities(self, entity_ids, chunk_size=10000, on_chunk=None):
+        """Удалить объекты пачками по списку ID."""
+        entity_ids = list(entity_ids)
+        with self._invalidating(entity_ids):
+            self.db_manager.execute_many_chunked(
+                self._DELETE_QUERY, ((item_id,) for item_id in entity_ids), chunk_size, on_chunk
+            )
+
+    def get_by_id(self, entity_id):
+        """Получить объект по ID: строка берётся из кэша или читается одним запросом к таблице.
+
+        В кэше хранятся неизменяемые строки таблицы, а объект создаётся заново при каждом
+        вызове, поэтому изменение полученного объекта не влияет на следующие чтения.
+        """
+        row = self.cache.get(entity_id)
+        if row is None:
+            query = f"SELECT {', '.join(self.columns)} FROM {self.table} WHERE {self.id_column} = ?"
+            row = self.db_manager.execute_query(query, (entity_id,)).fetchone()
+            if row is None:
+                return None
+            self.cache.put(entity_id, row)
+        return self._to_entity(row)
+
+    def get_many(self, entity_ids):
+        """Получить объекты по списку ID: словарь {ID: объект} для найденных.
+
+        Недостающие в кэше объекты читаются одним запросом WHERE ID IN (...)
+        (для очень длинных списков — по max_query_params ID в запросе).
+        """
+        found, missing = {}, []
+        for entity_id in dict.fromkeys(entity_ids):
+            row = self.cache.get(entity_id)
+            if row is None:
+                missing.append(entity_id)
+            else:
+                found[entity_id] = self._to_entity(row)
+        for start in range(0, len(missing), self.max_query_params):
+            chunk = missing[start:start + self.max_query_params]
+            query = (f"SELECT {', '.join(self.columns)} FROM {self.table} "
+                     f"WHERE {self.id_column} IN ({', '.join('?' * len(chunk))})")
+            for row in self.db_manager.execute_query(query, chunk).fetchall():
+                found[row[self.id_column]] = self._to_entity(row)
+                self.cache.put(row[self.id_column], row)
+        return found
+
+    def _to_results(self, rows, lazy=False):
+        """Преобразовать строки в объекты или, в ленивом режиме, в представления LazyRow."""
+        if lazy:
+            return [LazyRow(self, row) for row in rows]
+        return [self._to_entity(row) for row in rows]
+
+    def iter_all(self, batch_size=1000, lazy=False):
+        """Потоково перебрать все записи таблицы, читая их пачками через fetchmany."""
+        query = f"SELECT {', '.join(self.columns)} FROM {self.table} ORDER BY {self.id_column}"
+        cursor = self.db_manager.execute_query(query)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from self._to_results(rows, lazy)
+        finally:
+            cursor.close()
+
+    def _order_column(self, field):
+        """Столбец для сортировки по полю field, если по нему есть индекс."""
+        column = self.fields.get(field)
+        if column not in self.sortable_columns:
+            raise ValueError(f"Сортировка по полю {field} не поддерживается.")
+        return column
+
+    def sorted_by(self, field, offset=0, limit=None, reverse=False, lazy=False):
+        """Получить limit объектов начиная с offset в порядке поля field (ORDER BY по индексу)."""
+        column = self._order_column(field)
+        direction = "DESC" if reverse else "ASC"
+        order_by = column if column == self.id_column else f"{column} {direction}, {self.id_column}"
+        query = (f"SELECT {', '.join(self.columns)} FROM {self.table} "
+                 f"ORDER BY {order_by} {direction} LIMIT ? OFFSET ?")
+        rows = self.db_manager.execute_query(query, (-1 if limit is None else limit, offset)).fetchall()
+        return self._to_results(rows, lazy)
+
+    def top_k(self, field, k, largest=True, lazy=False):
+        """Получить k объектов с наибольшими (largest=False — наименьшими) значениями поля field."""
+        return self.sorted_by(field, 0, k, reverse=largest, lazy=lazy)
+
+    @staticmethod
+    def _encode_token(sort_by, value, last_id):
+        """Упаковать позицию последней строки страницы в непрозрачный курсор."""
+        return base64.urlsafe_b64encode(json.dumps([sort_by, value, last_id]).encode()).decode()
+
+    @staticmethod
+    def _decode_token(token, sort_by):
+        """Распаковать курсор и проверить, что он выдан для той же сортировки."""
+        try:
+            token_sort_by, value, last_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Некорректный курсор страницы.")
+        if token_sort_by != sort_by:
+            raise ValueError(f"Курсор выдан для сортировки по {token_sort_by}, а не по {sort_by}.")
+        return value, last_id
+
+    def get_page(self, n, token=None, sort_by=None, lazy=False):
+        """Получить n объектов после курсора token в порядке поля sort_by (по умолчанию — ID).
+
+        Возвращает пару (список объектов, курсор следующей страницы или None).
+        Выборка идёт поиском по индексу, поэтому любая страница стоит столько же, сколько первая.
+        """
+        sort_by = sort_by or self.columns[self.id_column]
+        column = self._order_column(sort_by)
+        if column == self.id_column:
+            order_by = self.id_column
+        else:
+            order_by = f"{column}, {self.id_column}"
+        where, params = "", ()
+        if token is not None:
+            value, last_id = self._decode_token(token, sort_by)
+            if column == self.id_column:
+                where, params = f"WHERE {self.id_column} > ?", (last_id,)
+            else:
+                where, params = f"WHERE ({column}, {self.id_column}) > (?, ?)", (value, last_id)
+        query = (f"SELECT {', '.join(self.columns)} FROM {self.table} {where} "
+                 f"ORDER BY {order_by} LIMIT ?")
+        rows = self.db_manager.execute_query(query, params + (n + 1,)).fetchall()
+        next_token = None
+        if len(rows) > n:
+            rows = rows[:n]
+            last = rows[-1]
+            next_token = self._encode_token(sort_by, last[column], last[self.id_column])
+        return self._to_results(rows, lazy), next_token
+
+
+class InstrumentedCursor:
+    """Обёртка курсора, которая считает прочитанные строки и время выборки.
+
+    Итог передаётся инструментам менеджера один раз: когда результат прочитан
+    до конца, курсор закрыт или обёртка удалена.
+    """
+
+    def __init__(self, cursor, manager, query, params, seconds):
+        self._cursor = cursor
+        self._manager = manager
+        self._query = query
+        self._params = params
+        self._seconds = seconds
+        self._rows = 0
+        self._reported = False
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        self._seconds += time.perf_counter() - started
+        return result
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            self._manager._record(self._query, self._params, self._seconds, self._rows)
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._report()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, size or self._cursor.arraysize)
+        self._rows += len(rows)
+        if not rows:
+            self._report()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self._report()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._report()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        self._report()
+
+
+class _PooledConnection:
+    """Соединение пула, принадлежащее одному потоку.
+
+    Хранится в локальных данных потока: когда поток завершается, они удаляются,
+    и финализатор закрывает соединение и убирает его из пула.
+    """
+
+    def __init__(self, manager, connection, setup_version):
+        self.connection = connection
+        self.setup_version = setup_version
+        self.finalizer = weakref.finalize(self, manager._release, connection)
+
+
 class DBConnectionManager:
-    """Менеджер соединений с базой данных (Singleton)."""
+    """Менеджер соединений с базой данных (Singleton для каждого файла).
+
+    Каждый поток получает собственное соединение из пула, поэтому менеджер можно
+    использовать из нескольких потоков; соединение закрывается, когда его поток
+    завершается. Каждый запрос выполняется в новом курсоре, так что результаты
+    разных запросов не перезаписывают друг друга.
+    """
     _instances = {}
+    _instances_lock = threading.Lock()
+    # Сколько секунд ждать снятия блокировки базы другим соединением.
+    busy_timeout = 5.0
+
+    def __new__(cls, db_name="database.db", busy_timeout=None):
+        with cls._instances_lock:
+            if db_name not in cls._instances:
+                instance = super(DBConnectionManager, cls).__new__(cls)
+                instance._init_pool(db_name, busy_timeout)
+                cls._instances[db_name] = instance
+            return cls._instances[db_name]
+
+    def _init_pool(self, db_name, busy_timeout):
+        """Инициализация пула соединений с базой данных SQLite."""
+        directory = os.path.dirname(db_name)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.db_name = db_name
+        if busy_timeout is not None:
+            self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Запросы настройки (PRAGMA, ATTACH), выполняемые при открытии каждого соединения:
+        # {ключ: (запрос, параметры)}. Номер версии растёт при каждом изменении набора.
+        self._setup_queries = {}
+        self._setup_version = 0
+        # Инструменты, вызываемые как instrument(query, seconds, rows) после каждого запроса.
+        self.instruments = []
+        # Журнал медленных запросов (query_stats.SlowQueryLog), включается enable_slow_query_log.
+        self.slow_query_log = None
 
-    def __new__(cls, db_name="database.db"):
-        if db_name not in cls._instances:
-            cls._instances[db_name] = super(DBConnectionManager, cls).__new__(cls)
-            cls._instances[db_name]._init_connection(db_name)
-        return cls._instances[db_name]
+    def _connect(self):
+        """Открыть новое соединение в режиме WAL и выполнить на нём запросы настройки."""
+        connection = sqlite3.connect(self.db_name, timeout=self.busy_timeout, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        connection.execute("PRAGMA journal_mode = WAL")
+        with self._lock:
+            setup_queries, setup_version = list(self._setup_queries.values()), self._setup_version
+        try:
+            for query, params in setup_queries:
+                connection.execute(query, params)
+        except Exception:
+            connection.close()
+            raise
+        with self._lock:
+            self._connections.append(connection)
+        return _PooledConnection(self, connection, setup_version)
+
+    def _release(self, connection):
+        """Убрать соединение из пула и закрыть его."""
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    @property
+    def connection(self):
+        """Соединение текущего потока.
+
+        Если после открытия соединения изменились запросы настройки, оно заменяется новым,
+        но только вне транзакции: внутри неё, например, PRAGMA foreign_keys не действует.
+        """
+        local = self._local
+        pooled = getattr(local, "pooled", None)
+        if (pooled is not None and pooled.setup_version != self._setup_version
+                and not pooled.connection.in_transaction):
+            # Прежнее соединение закроется само, когда станут не нужны его курсоры.
+            pooled.finalizer.detach()
+            with self._lock:
+                self._connections.remove(pooled.connection)
+            pooled = None
+        if pooled is None:
+            pooled = local.pooled = self._connect()
+        return pooled.connection
+
+    def add_setup_query(self, query, params=(), key=None):
+        """Выполнять запрос настройки при открытии каждого соединения пула.
+
+        Уже открытые соединения заменяются новыми при следующем обращении к ним вне
+        транзакции. Запрос с тем же key заменяет прежний (по умолчанию key — сам запрос
+        с параметрами): так повторный ATTACH с тем же псевдонимом подключает другой файл.
+        """
+        params = tuple(params)
+        if key is None:
+            key = (query, params)
+        with self._lock:
+            if self._setup_queries.get(key) != (query, params):
+                self._setup_queries[key] = (query, params)
+                self._setup_version += 1
+        return self.connection
+
+    def add_instrument(self, instrument):
+        """Подключить инструмент замеров запросов (например, query_stats.QueryStats)."""
+        self.instruments.append(instrument)
 
-    def _init_connection(self, db_name):
-        """Инициализация соединения с базой данных SQLite."""
-        if not os.path.exists(os.path.dirname(db_name)):
-            os.makedirs(os.path.dirname(db_name), exist_ok=True)
-        self.connection = sqlite3.connect(db_name)
-        self.connection.row_factory = sqlite3.Row
-        self.cursor = self.connection.cursor()
+    def remove_instrument(self, instrument):
+        """Отключить инструмент замеров запросов."""
+        self.instruments.remove(instrument)
+
+    def enable_slow_query_log(self, filename, threshold=0.1, max_bytes=1 << 20, backup_count=3):
+        """Записывать запросы дольше threshold секунд вместе с их планом в файл с ротацией."""
+        from query_stats import SlowQueryLog
+        self.slow_query_log = SlowQueryLog(filename, threshold, max_bytes, backup_count)
+        return self.slow_query_log
+
+    def disable_slow_query_log(self):
+        """Отключить журнал медленных запросов."""
+        self.slow_query_log = None
+
+    def _record(self, query, params, seconds, rows):
+        """Передать результат замера всем инструментам и журналу медленных запросов."""
+        for instrument in self.instruments:
+            instrument(query, seconds, rows)
+        if self.slow_query_log is not None:
+            self.slow_query_log.record(self.connection, query, params, seconds)
 
     def execute_query(self, query, params=None):
-        """Выполнить SQL-запрос."""
+        """Выполнить SQL-запрос в новом курсоре соединения текущего потока."""
         if params is None:
             params = ()
-        self.cursor.execute(query, params)
-        return self.cursor
+        if not self.instruments and self.slow_query_log is None:
+            return self.connection.execute(query, params)
+        started = time.perf_counter()
+        cursor = self.connection.execute(query, params)
+        seconds = time.perf_counter() - started
+        if cursor.description is None:
+            # Запрос без результата (INSERT, UPDATE, DELETE, DDL): строки известны сразу.
+            self._record(query, params, seconds, cursor.rowcount)
+            return cursor
+        return InstrumentedCursor(cursor, self, query, params, seconds)
+
+    def execute_many_chunked(self, query, params_seq, chunk_size=10000, on_chunk=None):
+        """Выполнить запрос для набора параметров пачками по chunk_size строк.
+
+        Каждая пачка выполняется через executemany в одной транзакции; при ошибке
+        откатывается только текущая пачка. Возвращает список пар
+        (число строк, rowid последней вставленной строки) по каждой пачке.
+        on_chunk(rows, seconds) вызывается после фиксации каждой пачки.
+        Уже зафиксированные пачки при ошибке остаются в базе: их список в том же виде
+        передаётся в атрибуте committed_chunks исключения.
+        """
+        connection = self.connection
+        params_iter = iter(params_seq)
+        chunks = []
+        try:
+            while True:
+                chunk = list(islice(params_iter, chunk_size))
+                if not chunk:
+                    return chunks
+                started = time.perf_counter()
+                try:
+                    connection.executemany(query, chunk)
+                    last_rowid = connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                chunks.append((len(chunk), last_rowid))
+                if self.instruments or self.slow_query_log is not None:
+                    # Для плана в журнале медленных запросов берутся параметры первой строки пачки.
+                    self._record(query, chunk[0], time.perf_counter() - started, len(chunk))
+                if on_chunk is not None:
+                    on_chunk(len(chunk), time.perf_counter() - started)
+        except Exception as error:
+            # Пачки из chunks уже зафиксированы, вызывающему нужен их список.
+            error.committed_chunks = chunks
+            raise
 
     def commit(self):
-        """Подтвердить транзакцию."""
+        """Подтвердить транзакцию текущего потока."""
         self.connection.commit()
 
+    def rollback(self):
+        """Откатить транзакцию текущего потока."""
+        self.connection.rollback()
+
     def close(self):
-        """Закрыть соединение с базой данных."""
-        self.connection.close()
+        """Закрыть все соединения пула."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
 
     def __del__(self):
-        """Закрыть соединение при удалении объекта."""
-        self.close()
\ No newline at end of file
+        """Закрыть соединения при удалении объекта."""
+        self.close()
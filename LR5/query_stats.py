@@ -0,0 +1,152 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Mapping
+from logging.handlers import RotatingFileHandler
+
+
+class StatementStats:
+    """Накопленная статистика по одному нормализованному SQL-запросу."""
+    # Верхние границы интервалов гистограммы времени выполнения, в секундах.
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.calls = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        # Последний интервал — для запросов дольше BUCKETS[-1].
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+
+    def add(self, seconds, rows):
+        """Учесть одно выполнение запроса."""
+        self.calls += 1
+        if rows > 0:
+            self.rows += rows
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+        for bucket, upper in enumerate(self.BUCKETS):
+            if seconds <= upper:
+                self.histogram[bucket] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.calls if self.calls else 0.0
+
+    def __repr__(self):
+        return (f"StatementStats(calls={self.calls}, rows={self.rows}, total={self.total_time:.6f}s, "
+                f"mean={self.mean_time:.6f}s, max={self.max_time:.6f}s, sql={self.sql!r})")
+
+
+class QueryStats:
+    """Сборщик статистики SQL-запросов для DBConnectionManager.add_instrument.
+
+    Вызывается как instrument(query, seconds, rows); запросы группируются по тексту,
+    в котором литералы заменены на ? и пробелы схлопнуты.
+    """
+    _STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+    _NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self):
+        self.statements = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def normalize(cls, query):
+        """Привести текст запроса к виду, не зависящему от литералов и форматирования."""
+        query = cls._STRING_LITERAL.sub("?", query)
+        query = cls._NUMBER_LITERAL.sub("?", query)
+        return cls._WHITESPACE.sub(" ", query).strip()
+
+    def __call__(self, query, seconds, rows):
+        sql = self.normalize(query)
+        with self._lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = StatementStats(sql)
+            stats.add(seconds, rows)
+
+    def top_slowest(self, n=10, key="total_time"):
+        """n запросов с наибольшим значением key (total_time, max_time, mean_time, calls)."""
+        with self._lock:
+            statements = list(self.statements.values())
+        return sorted(statements, key=lambda stats: getattr(stats, key), reverse=True)[:n]
+
+    def over_threshold(self, seconds):
+        """Запросы, хотя бы одно выполнение которых длилось дольше seconds."""
+        with self._lock:
+            return [stats for stats in self.statements.values() if stats.max_time > seconds]
+
+    def dump(self, n=10, key="total_time"):
+        """Текстовый отчёт по n самым медленным запросам."""
+        lines = [f"{'calls':>8} {'rows':>10} {'total, s':>10} {'mean, ms':>10} {'max, ms':>10}  sql"]
+        for stats in self.top_slowest(n, key):
+            lines.append(f"{stats.calls:>8} {stats.rows:>10} {stats.total_time:>10.4f} "
+                         f"{stats.mean_time * 1000:>10.3f} {stats.max_time * 1000:>10.3f}  {stats.sql}")
+        return "\n".join(lines)
+
+    def reset(self):
+        """Очистить накопленную статистику."""
+        with self._lock:
+            self.statements = {}
+
+
+class SlowQueryLog:
+    """Журнал медленных запросов с планом выполнения (EXPLAIN QUERY PLAN).
+
+    Пишет в локальный файл с ротацией по размеру. Значения параметров
+    не сохраняются: вместо них записываются только их типы (и длина строк).
+    """
+
+    def __init__(self, filename, threshold=0.1, max_bytes=1 << 20, backup_count=3):
+        self.filename = filename
+        self.threshold = threshold
+        self.logger = logging.getLogger(f"slow_query_log.{os.path.abspath(filename)}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+
+    @staticmethod
+    def _redact_value(value):
+        if isinstance(value, str):
+            return f"<str:{len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    @classmethod
+    def redact(cls, params):
+        """Заменить значения параметров их типами; у именованных параметров имена сохраняются."""
+        if isinstance(params, Mapping):
+            return {name: cls._redact_value(value) for name, value in params.items()}
+        return [cls._redact_value(value) for value in params]
+
+    @staticmethod
+    def explain(connection, query, params):
+        """Строки плана выполнения запроса или пустой список, если план получить нельзя."""
+        try:
+            return [row[3] for row in connection.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def record(self, connection, query, params, seconds):
+        """Записать запрос в журнал, если он выполнялся дольше порога."""
+        if seconds < self.threshold:
+            return
+        plan = self.explain(connection, query, params)
+        # Просмотр виртуальной таблицы (FTS5) идёт по её собственному индексу и полным не считается.
+        full_scan = any(step.startswith("SCAN") and "USING" not in step and "VIRTUAL TABLE" not in step
+                        for step in plan)
+        self.logger.warning(
+            "slow query %.1f ms%s\n  sql: %s\n  params: %s\n  plan: %s",
+            seconds * 1000, " [FULL SCAN]" if full_scan else "",
+            " ".join(query.split()), self.redact(params), "; ".join(plan) or "-",
+        )
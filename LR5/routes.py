@@ -1,10 +1,19 @@
-from models import MyEntityRepository, DBConnectionManager, Validator
-import json
-import yaml
+from models import (MyEntityRepository, JSONRepository, BinarySnapshotRepository, DBRepository, Validator,
+                    yaml_cache)
 
 
 class Route:
     """Класс Route полями из диаграммы и встроенной валидацией."""
+    __slots__ = ("route_id", "route_name", "start_route", "end_route", "distance", "driver_payment")
+    # Правила пакетной проверки столбцов (см. Validator.validate_batch).
+    BATCH_RULES = {
+        "route_name": ("string", "Название маршрута"),
+        "start_route": ("string", "Начальная точка"),
+        "end_route": ("string", "Конечная точка"),
+        "distance": ("positive_integer", "Расстояние"),
+        "driver_payment": ("positive_integer", "Оплата водителю"),
+    }
+
     def __init__(self, route_id=None, route_name=None, start_route=None, end_route=None,
                  distance=None, driver_payment=None):
         self.route_id = route_id
@@ -14,51 +23,85 @@ class Route:
         self.distance = Validator.validate_positive_integer(distance, "Расстояние")
         self.driver_payment = Validator.validate_positive_integer(driver_payment, "Оплата водителю")
 
+    @classmethod
+    def from_row(cls, row):
+        """Создать маршрут из уже проверенных сохранённых данных без повторной валидации."""
+        route = cls.__new__(cls)
+        route.route_id = row["route_id"]
+        route.route_name = row["route_name"]
+        route.start_route = row["start_route"]
+        route.end_route = row["end_route"]
+        route.distance = row["distance"]
+        route.driver_payment = row["driver_payment"]
+        return route
+
+    @classmethod
+    def validate_batch(cls, columns):
+        """Проверить столбцы значений полей маршрутов без исключений на первой ошибке."""
+        return Validator.validate_batch(columns, cls.BATCH_RULES)
+
+    def to_dict(self):
+        """Поля объекта в виде словаря для сохранения."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def get_id(self):
+        return self.route_id
+
+    def set_id(self, route_id):
+        self.route_id = route_id
+
     def __repr__(self):
         return (f"Route(route_id={self.route_id}, route_name={self.route_name}, start_route={self.start_route}, "
                 f"end_route={self.end_route}, distance={self.distance}, driver_payment={self.driver_payment})")
 
 
-class RoutesRepositoryJSON(MyEntityRepository):
+class RoutesRepositoryJSON(JSONRepository):
     """Репозиторий для работы с маршрутами в формате JSON."""
-    def load_entities(self):
-        """Загрузка данных из JSON-файла."""
-        try:
-            with open(self.filename, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                return [Route(**entry) for entry in data]
-        except FileNotFoundError:
-            return []
-
-    def save_entities(self):
-        """Сохранение данных в JSON-файл."""
-        with open(self.filename, "w", encoding="utf-8") as file:
-            json.dump([entity.__dict__ for entity in self.entities], file, ensure_ascii=False, indent=4)
+    entity_class = Route
+    sorted_fields = ("route_name", "distance")
 
 class RoutesRepositoryYAML(MyEntityRepository):
     """Репозиторий для работы с маршрутами в формате YAML."""
+    entity_class = Route
+    sorted_fields = ("route_name", "distance")
     def load_entities(self):
         """Загрузка данных из YAML-файла."""
         try:
-            with open(self.filename, "r", encoding="utf-8") as file:
-                data = yaml.safe_load(file)
-                return [Route(**entry) for entry in data]
+            data = yaml_cache.load(self.filename)
         except FileNotFoundError:
             return []
+        return [self._hydrate(entry) for entry in data or []]
 
     def save_entities(self):
         """Сохранение данных в YAML-файл."""
-        with open(self.filename, "w", encoding="utf-8") as file:
-            yaml.dump([entity.__dict__ for entity in self.entities], file, allow_unicode=True)
+        yaml_cache.dump(self.filename, [entity.to_dict() for entity in self.entities])
 
 
-class RoutesRepositoryDB(MyEntityRepository):
-    """Репозиторий для работы с таблицей routes в базе данных."""
-    def __init__(self, db_name):
-        from models import DBConnectionManager
-        self.db_manager = DBConnectionManager(db_name)
-        self._initialize_table()
+class RoutesRepositoryBinary(BinarySnapshotRepository):
+    """Репозиторий для работы с маршрутами в двоичном снимке."""
+    entity_class = Route
+    sorted_fields = ("route_name", "distance")
+    record_fields = (
+        ("route_id", "int"), ("route_name", "str"), ("start_route", "str"), ("end_route", "str"),
+        ("distance", "int"), ("driver_payment", "int"),
+    )
+
 
+class RoutesRepositoryDB(DBRepository):
+    """Репозиторий для работы с таблицей routes в базе данных."""
+    entity_class = Route
+    table = "routes"
+    id_column = "RouteId"
+    columns = {
+        "RouteId": "route_id", "RouteName": "route_name", "StartRoute": "start_route",
+        "EndRoute": "end_route", "Distance": "distance", "DriverPayment": "driver_payment",
+    }
+    sortable_columns = ("RouteId", "RouteName", "Distance")
+    _INSERT_QUERY = """INSERT INTO routes (RouteName, StartRoute, EndRoute, Distance, DriverPayment)
+                   VALUES (?, ?, ?, ?, ?)"""
+    _UPDATE_QUERY = """UPDATE routes SET RouteName = ?, StartRoute = ?, EndRoute = ?, 
+                   Distance = ?, DriverPayment = ? WHERE RouteId = ?"""
+    _DELETE_QUERY = "DELETE FROM routes WHERE RouteId = ?"
     def _initialize_table(self):
         """Создание таблицы, если её нет."""
         query = """
@@ -74,17 +117,8 @@ class RoutesRepositoryDB(MyEntityRepository):
         self.db_manager.execute_query(query)
         self.db_manager.commit()
 
-    def get_by_id(self, route_id):
-        """Получить маршрут по ID."""
-        query = "SELECT * FROM routes WHERE RouteId = ?"
-        cursor = self.db_manager.execute_query(query, (route_id,))
-        result = cursor.fetchone()
-        if result:
-            return Route(**result)
-        return None
-
-    def get_k_n_short_list(self, k, n):
-        """Получить список k по счету n объектов класса Route."""
+    def get_k_n_short_list(self, k, n, lazy=False):
+        """Получить список k по счету n объектов класса Route (или LazyRow при lazy=True)."""
         offset = (k - 1) * n
         query = """
             SELECT RouteId, RouteName, StartRoute, EndRoute, Distance, DriverPayment
@@ -93,31 +127,12 @@ class RoutesRepositoryDB(MyEntityRepository):
         """
         cursor = self.db_manager.execute_query(query, (n, offset))
         results = cursor.fetchall()
-        return [Route(**dict(row)) for row in results]
+        return self._to_results(results, lazy)
 
-    def add_entity(self, route: Route):
-        """Добавить маршрут в базу данных."""
-        query = """INSERT INTO routes (RouteName, StartRoute, EndRoute, Distance, DriverPayment)
-                   VALUES (?, ?, ?, ?, ?)"""
-        self.db_manager.execute_query(query, (
-            route.route_name, route.start_route, route.end_route, route.distance, route.driver_payment
-        ))
-        self.db_manager.commit()
-
-    def replace_entity_by_id(self, route_id, updated_route):
-        """Обновить маршрут по ID."""
-        query = """UPDATE routes SET RouteName = ?, StartRoute = ?, EndRoute = ?, 
-                   Distance = ?, DriverPayment = ? WHERE RouteId = ?"""
-        self.db_manager.execute_query(query, (updated_route.route_name, updated_route.start_route,
-                                              updated_route.end_route, updated_route.distance,
-                                              updated_route.driver_payment, route_id))
-        self.db_manager.commit()
-
-    def delete_entity_by_id(self, route_id):
-        """Удалить маршрут по ID."""
-        query = "DELETE FROM routes WHERE RouteId = ?"
-        self.db_manager.execute_query(query, (route_id,))
-        self.db_manager.commit()
+    @staticmethod
+    def _row_params(route):
+        """Значения столбцов таблицы routes для объекта Route."""
+        return (route.route_name, route.start_route, route.end_route, route.distance, route.driver_payment)
 
     def get_count(self):
         """Получить количество маршрутов."""
@@ -1,17 +1,69 @@
-from models import MyEntityRepository, DBConnectionManager, Validator
-import json
-import yaml
+from models import (MyEntityRepository, JSONRepository, BinarySnapshotRepository, DBRepository, Validator,
+                    yaml_cache, to_iso_date)
+import heapq
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import date
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
 
 
 class Shipment:
     """Класс Shipment полями из диаграммы и встроенной валидацией."""
+    __slots__ = ("shipment_id", "route_id", "driver_id", "departure_date", "arrival_date", "bonus")
+    # Правила пакетной проверки столбцов (см. Validator.validate_batch).
+    BATCH_RULES = {
+        "route_id": ("positive_integer", "ID маршрута"),
+        "driver_id": ("positive_integer", "ID водителя"),
+        "departure_date": ("date", "Дата отправления"),
+        "arrival_date": ("date", "Дата прибытия"),
+        "bonus": ("bonus", "Премия"),
+    }
+
     def __init__(self, shipment_id=None, route_id=None, driver_id=None,
                  departure_date=None, arrival_date=None, bonus=None):
         self.shipment_id = shipment_id
         self.route_id = Validator.validate_positive_integer(route_id, "ID маршрута")
         self.driver_id = Validator.validate_positive_integer(driver_id, "ID водителя")
         self.departure_date, self.arrival_date = Validator.validate_departure_and_arrival_dates(departure_date, arrival_date)
-        self.bonus = Validator.validate_non_negative_number(bonus, "Премия")
+        self.bonus = Validator.validate_bonus(bonus, "Премия")
+
+    @classmethod
+    def from_row(cls, row):
+        """Создать перевозку из уже проверенных сохранённых данных без повторной валидации."""
+        shipment = cls.__new__(cls)
+        shipment.shipment_id = row["shipment_id"]
+        shipment.route_id = row["route_id"]
+        shipment.driver_id = row["driver_id"]
+        shipment.departure_date = row["departure_date"]
+        shipment.arrival_date = row["arrival_date"]
+        shipment.bonus = row["bonus"]
+        return shipment
+
+    @classmethod
+    def validate_batch(cls, columns):
+        """Проверить столбцы значений полей перевозок, включая порядок дат отправки и прибытия."""
+        report = Validator.validate_batch(columns, cls.BATCH_RULES)
+        departures = report.columns["departure_date"]
+        arrivals = report.columns["arrival_date"]
+        for row in report.valid_rows:
+            if Validator.parse_date(departures[row]) > Validator.parse_date(arrivals[row]):
+                report.add_error(row, "arrival_date", "Дата отправки не может быть позже даты прибытия.")
+        return report
+
+    def to_dict(self):
+        """Поля объекта в виде словаря для сохранения."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def get_id(self):
+        return self.shipment_id
+
+    def set_id(self, shipment_id):
+        self.shipment_id = shipment_id
 
     def __repr__(self):
         return (f"Shipment(shipment_id={self.shipment_id}, route_id={self.route_id}, driver_id={self.driver_id}, "
@@ -21,44 +73,522 @@ class Shipment:
         return (f"Shipment(shipment_id={self.shipment_id}, route_id={self.route_id}, driver_id={self.driver_id}, "
                 f"departure_date={self.departure_date}, arrival_date={self.arrival_date}, bonus={self.bonus})")
 
-class ShipmentsRepositoryJSON(MyEntityRepository):
+
+def date_to_ordinal(value):
+    """Порядковый номер дня для даты ДД.ММ.ГГГГ."""
+    return Validator.parse_date(value).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def date_from_ordinal(ordinal):
+    """Дата ДД.ММ.ГГГГ по порядковому номеру дня."""
+    return date.fromordinal(ordinal).strftime("%d.%m.%Y")
+
+
+class ShipmentRow:
+    """Лёгкое представление строки ShipmentTable с интерфейсом объекта Shipment."""
+    __slots__ = ("_table", "_slot")
+
+    def __init__(self, table, slot):
+        self._table = table
+        self._slot = slot
+
+    @property
+    def shipment_id(self):
+        return self._table.shipment_ids[self._slot]
+
+    @property
+    def route_id(self):
+        return self._table.route_ids[self._slot]
+
+    @property
+    def driver_id(self):
+        return self._table.driver_ids[self._slot]
+
+    @property
+    def departure_date(self):
+        return date_from_ordinal(self._table.departures[self._slot])
+
+    @property
+    def arrival_date(self):
+        return date_from_ordinal(self._table.arrivals[self._slot])
+
+    @property
+    def bonus(self):
+        bonus = self._table.bonuses[self._slot]
+        return int(bonus) if self._table.integer_bonuses[self._slot] else bonus
+
+    def get_id(self):
+        return self.shipment_id
+
+    def to_dict(self):
+        """Поля строки в виде словаря для сохранения."""
+        return {field: getattr(self, field) for field in Shipment.__slots__}
+
+    def to_shipment(self):
+        """Создать независимый объект Shipment из строки."""
+        return Shipment.from_row(self.to_dict())
+
+    def __repr__(self):
+        return (f"ShipmentRow(shipment_id={self.shipment_id}, route_id={self.route_id}, driver_id={self.driver_id}, "
+                f"departure_date={self.departure_date}, arrival_date={self.arrival_date}, bonus={self.bonus})")
+
+
+class ShipmentTable:
+    """Столбцовое хранилище перевозок в памяти в массивах модуля array.
+
+    ID хранятся как 64-битные целые, даты — как порядковые номера дней, премия — как double
+    с признаком целого числа: одна перевозка занимает меньше 50 байт вместо сотен байт у
+    отдельного объекта. Пока ID добавляются по возрастанию, строка ищется двоичным поиском
+    по столбцу ID; иначе строится словарь ID -> номер строки. Удалённая строка только
+    помечается и не сдвигает остальные, место освобождает compact().
+    """
+
+    def __init__(self):
+        self.shipment_ids = array("q")
+        self.route_ids = array("q")
+        self.driver_ids = array("q")
+        self.departures = array("i")
+        self.arrivals = array("i")
+        self.bonuses = array("d")
+        self.integer_bonuses = array("b")
+        self.deleted = array("b")
+        self._count = 0
+        # Словарь ID -> номер строки; None, пока столбец ID упорядочен по возрастанию.
+        self._slots = None
+
+    @classmethod
+    def from_shipments(cls, shipments):
+        """Построить таблицу из итерируемого набора перевозок, например ShipmentsRepositoryJSON.iter_file()."""
+        table = cls()
+        for shipment in shipments:
+            table.append(shipment)
+        return table
+
+    @staticmethod
+    def _values(shipment):
+        """Значения столбцов для полей перевозки (без ID)."""
+        return (shipment.route_id, shipment.driver_id, date_to_ordinal(shipment.departure_date),
+                date_to_ordinal(shipment.arrival_date), shipment.bonus, isinstance(shipment.bonus, int))
+
+    def _columns(self):
+        """Столбцы полей перевозки в порядке _values()."""
+        return (self.route_ids, self.driver_ids, self.departures, self.arrivals, self.bonuses, self.integer_bonuses)
+
+    def _slot(self, shipment_id):
+        """Номер строки неудалённой перевозки с ID shipment_id или None."""
+        if self._slots is not None:
+            return self._slots.get(shipment_id)
+        shipment_ids = self.shipment_ids
+        slot = bisect_left(shipment_ids, shipment_id)
+        if slot < len(shipment_ids) and shipment_ids[slot] == shipment_id and not self.deleted[slot]:
+            return slot
+        return None
+
+    def _slot_map(self):
+        """Словарь ID -> номер строки неудалённых перевозок."""
+        return {shipment_id: slot for slot, shipment_id in enumerate(self.shipment_ids) if not self.deleted[slot]}
+
+    def append(self, shipment):
+        """Добавить перевозку с заданным ID в конец таблицы."""
+        shipment_id = Validator.validate_positive_integer(shipment.shipment_id, "ID перевозки")
+        if self._slot(shipment_id) is not None:
+            raise ValueError(f"Перевозка с ID {shipment_id} уже есть в таблице.")
+        values = self._values(shipment)
+        slot = len(self.shipment_ids)
+        if self._slots is None and slot and shipment_id <= self.shipment_ids[-1]:
+            self._slots = self._slot_map()
+        if self._slots is not None:
+            self._slots[shipment_id] = slot
+        self.shipment_ids.append(shipment_id)
+        self.deleted.append(0)
+        for column, value in zip(self._columns(), values):
+            column.append(value)
+        self._count += 1
+
+    def get_by_id(self, shipment_id):
+        """Получить строку перевозки по ID или None."""
+        slot = self._slot(shipment_id)
+        return None if slot is None else ShipmentRow(self, slot)
+
+    def replace(self, shipment_id, shipment):
+        """Заменить поля перевозки с ID shipment_id на месте."""
+        slot = self._slot(shipment_id)
+        if slot is None:
+            raise ValueError(f"Объект с ID {shipment_id} не найден.")
+        for column, value in zip(self._columns(), self._values(shipment)):
+            column[slot] = value
+
+    def delete(self, shipment_id):
+        """Удалить перевозку: строка помечается удалённой, остальные строки не сдвигаются."""
+        slot = self._slot(shipment_id)
+        if slot is not None:
+            self.deleted[slot] = 1
+            if self._slots is not None:
+                del self._slots[shipment_id]
+            self._count -= 1
+
+    def compact(self):
+        """Убрать строки удалённых перевозок. Полученные раньше ShipmentRow становятся недействительными."""
+        live = [slot for slot in range(len(self.deleted)) if not self.deleted[slot]]
+        for name in ("shipment_ids", "route_ids", "driver_ids", "departures", "arrivals", "bonuses",
+                     "integer_bonuses"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[slot] for slot in live)))
+        self.deleted = array("b", bytes(len(live)))
+        shipment_ids = self.shipment_ids
+        ordered = all(shipment_ids[slot - 1] < shipment_ids[slot] for slot in range(1, len(shipment_ids)))
+        self._slots = None if ordered else self._slot_map()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, shipment_id):
+        return self._slot(shipment_id) is not None
+
+    def __iter__(self):
+        deleted = self.deleted
+        for slot in range(len(deleted)):
+            if not deleted[slot]:
+                yield ShipmentRow(self, slot)
+
+    def __repr__(self):
+        return f"ShipmentTable(rows={len(self)}, slots={len(self.shipment_ids)})"
+
+
+class ShipmentsFileRepositoryMixin:
+    """Общие индексы и запросы по датам для файловых репозиториев перевозок."""
+    entity_class = Shipment
+    indexed_fields = ("driver_id", "route_id")
+    range_indexed_fields = {"departure_date": to_iso_date, "arrival_date": to_iso_date}
+
+    def find_by_departure_range(self, start, end):
+        """Получить перевозки с датой отправления в диапазоне [start, end] (ДД.ММ.ГГГГ)."""
+        return self.find_in_range("departure_date", Validator.validate_date(start, "Начало периода"),
+                                  Validator.validate_date(end, "Конец периода"))
+
+    def find_by_arrival_range(self, start, end):
+        """Получить перевозки с датой прибытия в диапазоне [start, end] (ДД.ММ.ГГГГ)."""
+        return self.find_in_range("arrival_date", Validator.validate_date(start, "Начало периода"),
+                                  Validator.validate_date(end, "Конец периода"))
+
+
+class ShipmentsRepositoryJSON(ShipmentsFileRepositoryMixin, JSONRepository):
     """Репозиторий для работы с перевозками в формате JSON."""
-    def load_entities(self):
-        """Загрузка данных из JSON-файла."""
-        try:
-            with open(self.filename, "r", encoding="utf-8") as file:
-                data = json.load(file)
-                return [Shipment(**entry) for entry in data]
-        except FileNotFoundError:
-            return []
 
-    def save_entities(self):
-        """Сохранение данных в JSON-файл."""
-        with open(self.filename, "w", encoding="utf-8") as file:
-            json.dump([entity.__dict__ for entity in self.entities], file, ensure_ascii=False, indent=4)
 
-class ShipmentsRepositoryYAML(MyEntityRepository):
+class ShipmentsRepositoryYAML(ShipmentsFileRepositoryMixin, MyEntityRepository):
     """Репозиторий для работы с перевозками в формате YAML."""
     def load_entities(self):
         """Загрузка данных из YAML-файла."""
         try:
-            with open(self.filename, "r", encoding="utf-8") as file:
-                data = yaml.safe_load(file)
-                return [Shipment(**entry) for entry in data]
+            data = yaml_cache.load(self.filename)
         except FileNotFoundError:
             return []
+        return [self._hydrate(entry) for entry in data or []]
 
     def save_entities(self):
         """Сохранение данных в YAML-файл."""
-        with open(self.filename, "w", encoding="utf-8") as file:
-            yaml.dump([entity.__dict__ for entity in self.entities], file, allow_unicode=True)
+        yaml_cache.dump(self.filename, [entity.to_dict() for entity in self.entities])
+
+
+class ShipmentsRepositoryBinary(ShipmentsFileRepositoryMixin, BinarySnapshotRepository):
+    """Репозиторий для работы с перевозками в двоичном снимке."""
+    record_fields = (
+        ("shipment_id", "int"), ("route_id", "int"), ("driver_id", "int"),
+        ("departure_date", "str"), ("arrival_date", "str"), ("bonus", "float"),
+    )
+
+
+class ShipmentsRepositoryMMap(MyEntityRepository):
+    """Репозиторий перевозок в отображённом в память (mmap) файле записей фиксированной длины.
+
+    Перевозка с ID n хранится в записи n - 1, поэтому get_by_id — это чтение по смещению,
+    а replace_entity_by_id перезаписывает запись на месте. Удалённая запись помечается
+    нулевым ID. Объекты в памяти не хранятся: iter_records() распаковывает записи прямо
+    из отображения без копирования файла.
+    """
+    entity_class = Shipment
+
+    MAGIC = b"LR5M"
+    VERSION = 1
+    # Сигнатура, версия, длина записи, число занятых записей, число неудалённых перевозок.
+    HEADER = struct.Struct("<4sHHQQ")
+    # ID перевозки (0 — удалена), ID маршрута, ID водителя, даты отправления и прибытия
+    # (порядковые номера дней), премия.
+    RECORD = struct.Struct("<qqqiid")
+    # Поля перевозки в порядке значений записи.
+    RECORD_FIELDS = ("shipment_id", "route_id", "driver_id", "departure_date", "arrival_date", "bonus")
+    # Минимальное число записей, на которое увеличивается файл.
+    GROWTH = 1024
+    # Число записей, копируемых из отображения за один шаг iter_records().
+    CHUNK = 4096
+
+    def __init__(self, filename, verify_on_read=None):
+        if not os.path.exists(filename):
+            with open(filename, "wb") as file:
+                file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.RECORD.size, 0, 0))
+        self._file = open(filename, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, version, record_size, _, _ = self.HEADER.unpack_from(self._mmap)
+        if magic != self.MAGIC or version != self.VERSION or record_size != self.RECORD.size:
+            self._mmap.close()
+            self._file.close()
+            raise ValueError(f"Файл {filename} не является файлом записей перевозок.")
+        super().__init__(filename, verify_on_read=verify_on_read)
+
+    def _load(self):
+        """Отобразить файл заново (другой процесс мог его увеличить) и прочитать заголовок."""
+        if len(self._mmap) != os.fstat(self._file.fileno()).st_size:
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self._slots, self._live = self.HEADER.unpack_from(self._mmap)[3:]
+        self._version = self._file_version()
+        self._rebuild_indexes()
+
+    def _file_version(self):
+        """Версия данных: заголовок в отображении (записи других процессов видны в нём сразу)."""
+        return self.HEADER.unpack_from(self._mmap)[3:]
+
+    def _offset(self, slot):
+        return self.HEADER.size + slot * self.RECORD.size
+
+    def _capacity(self):
+        return (len(self._mmap) - self.HEADER.size) // self.RECORD.size
+
+    def _write_header(self):
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.VERSION, self.RECORD.size, self._slots, self._live)
+        self._version = (self._slots, self._live)
+
+    def _is_live(self, shipment_id):
+        """Есть ли неудалённая запись с таким ID (проверка по смещению, без создания объекта)."""
+        slot = shipment_id - 1
+        return 0 <= slot < self._slots and struct.unpack_from("<q", self._mmap, self._offset(slot))[0] != 0
+
+    def _reserve(self, slots):
+        """Увеличить файл так, чтобы в нём помещалось не меньше slots записей."""
+        capacity = self._capacity()
+        if slots <= capacity:
+            return
+        capacity = max(slots, capacity + max(self.GROWTH, capacity // 2))
+        self._mmap.close()
+        self._file.truncate(self._offset(capacity))
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
 
-class ShipmentsRepositoryDB(MyEntityRepository):
+    @staticmethod
+    def _pack_values(shipment):
+        return (shipment.route_id, shipment.driver_id, date_to_ordinal(shipment.departure_date),
+                date_to_ordinal(shipment.arrival_date), shipment.bonus)
+
+    def _to_entity(self, record):
+        """Создать перевозку из распакованной записи."""
+        shipment_id, route_id, driver_id, departure, arrival, bonus = record
+        return self._hydrate({
+            "shipment_id": shipment_id, "route_id": route_id, "driver_id": driver_id,
+            "departure_date": date_from_ordinal(departure),
+            "arrival_date": date_from_ordinal(arrival),
+            "bonus": int(bonus) if bonus.is_integer() else bonus,
+        })
+
+    def iter_records(self):
+        """Перебрать неудалённые записи как кортежи (ID, маршрут, водитель, отправление, прибытие, премия).
+
+        Даты — порядковые номера дней. Записи копируются из отображения блоками по CHUNK
+        записей, поэтому во время перебора файл можно изменять и увеличивать (add_entity).
+        """
+        for start in range(0, self._slots, self.CHUNK):
+            chunk = self._mmap[self._offset(start):self._offset(min(start + self.CHUNK, self._slots))]
+            for record in self.RECORD.iter_unpack(chunk):
+                if record[0]:
+                    yield record
+
+    def iter_entities(self):
+        """Перебрать неудалённые перевозки как объекты Shipment."""
+        for record in self.iter_records():
+            yield self._to_entity(record)
+
+    @property
+    def entities(self):
+        return list(self.iter_entities())
+
+    @entities.setter
+    def entities(self, shipments):
+        """Заменить содержимое файла перевозками shipments с сохранением их ID."""
+        shipments = list(shipments)
+        slots = max((shipment.get_id() for shipment in shipments), default=0)
+        self._reserve(slots)
+        self._mmap[self.HEADER.size:self._offset(slots)] = bytes(slots * self.RECORD.size)
+        for shipment in shipments:
+            self.RECORD.pack_into(self._mmap, self._offset(shipment.get_id() - 1), shipment.get_id(),
+                                  *self._pack_values(shipment))
+        self._slots, self._live = slots, len(shipments)
+        self._write_header()
+
+    def _rebuild_indexes(self):
+        """Индексы в памяти не нужны: позиция записи определяется ID.
+
+        Атрибуты индексов базового класса задаются пустыми, чтобы унаследованные
+        search() и find_in_range() сообщали об отсутствии индекса через ValueError.
+        """
+        self._id_index, self._positions, self._secondary = {}, {}, {}
+        self._trie = None
+        # Упорядоченных индексов нет: sorted_by и top_k выполняются полным просмотром.
+        self._ranges, self._sort_keys = {}, {}
+
+    def load_entities(self):
+        return self.entities
+
+    def save_entities(self):
+        """Сбросить изменённые страницы отображения на диск."""
+        self._mmap.flush()
+
+    def compact(self):
+        self.save_entities()
+
+    def flush(self):
+        """Изменения записываются в отображение сразу; flush() сбрасывает его страницы на диск."""
+        with self._lock:
+            self.save_entities()
+
+    def get_by_id(self, shipment_id):
+        """Получить перевозку по ID чтением одной записи."""
+        slot = shipment_id - 1
+        if not 0 <= slot < self._slots:
+            return None
+        record = self.RECORD.unpack_from(self._mmap, self._offset(slot))
+        return self._to_entity(record) if record[0] else None
+
+    def find_by_field(self, field, value):
+        """Получить список перевозок, у которых поле field равно value (полный просмотр)."""
+        if field not in Shipment.__slots__:
+            raise ValueError(f"Поле {field} не существует в классе Shipment.")
+        return [shipment for shipment in self.iter_entities() if getattr(shipment, field) == value]
+
+    def _find_by_date_range(self, position, start, end):
+        low = date_to_ordinal(Validator.validate_date(start, "Начало периода"))
+        high = date_to_ordinal(Validator.validate_date(end, "Конец периода"))
+        return [self._to_entity(record) for record in self.iter_records() if low <= record[position] <= high]
+
+    def find_by_departure_range(self, start, end):
+        """Получить перевозки с датой отправления в диапазоне [start, end] (ДД.ММ.ГГГГ)."""
+        return self._find_by_date_range(3, start, end)
+
+    def find_by_arrival_range(self, start, end):
+        """Получить перевозки с датой прибытия в диапазоне [start, end] (ДД.ММ.ГГГГ)."""
+        return self._find_by_date_range(4, start, end)
+
+    def get_k_n_short_list(self, k, n):
+        """Получить список k по счету n перевозок."""
+        start = (k - 1) * n
+        if self._live == self._slots:
+            # Удалённых записей нет: страница — это непрерывный участок файла.
+            end = min(start + n, self._slots)
+            return [self._to_entity(self.RECORD.unpack_from(self._mmap, self._offset(slot)))
+                    for slot in range(start, end)]
+        return [self._to_entity(record) for record in islice(self.iter_records(), start, start + n)]
+
+    def _record_position(self, field):
+        """Номер значения поля field в распакованной записи."""
+        if field not in self.RECORD_FIELDS:
+            raise ValueError(f"Поле {field} не существует в классе Shipment.")
+        return self.RECORD_FIELDS.index(field)
+
+    def sorted_by(self, field, offset=0, limit=None, reverse=False):
+        """Получить limit перевозок начиная с offset в порядке поля field.
+
+        Сравниваются распакованные записи (даты — как порядковые номера дней), а объекты
+        Shipment создаются только для результата.
+        """
+        key = itemgetter(self._record_position(field), 0)
+        if limit is None:
+            records = sorted(self.iter_records(), key=key, reverse=reverse)[offset:]
+        else:
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            records = select(offset + limit, self.iter_records(), key=key)[offset:]
+        return [self._to_entity(record) for record in records]
+
+    def top_k(self, field, k, largest=True):
+        """Получить k перевозок с наибольшими (largest=False — наименьшими) значениями поля field."""
+        return self.sorted_by(field, 0, k, reverse=largest)
+
+    def sort_by_field(self, field):
+        """Записи хранятся в порядке ID (позиция записи определяется ID), поэтому допустим только shipment_id.
+
+        Для других полей нужно использовать sorted_by или top_k.
+        """
+        self._record_position(field)
+        if field != "shipment_id":
+            raise ValueError(f"Записи файла упорядочены по ID и не сортируются по полю {field}: "
+                             f"используйте sorted_by.")
+
+    def add_entity(self, shipment):
+        """Добавить перевозку в конец файла с новым ID."""
+        values = self._pack_values(shipment)
+        with self._lock:
+            self._reserve(self._slots + 1)
+            new_id = self._slots + 1
+            self.RECORD.pack_into(self._mmap, self._offset(self._slots), new_id, *values)
+            shipment.set_id(new_id)
+            self._slots += 1
+            self._live += 1
+            self._write_header()
+
+    def replace_entity_by_id(self, shipment_id, updated_shipment):
+        """Перезаписать запись перевозки на месте."""
+        values = self._pack_values(updated_shipment)
+        with self._lock:
+            if not self._is_live(shipment_id):
+                raise ValueError(f"Объект с ID {shipment_id} не найден.")
+            self.RECORD.pack_into(self._mmap, self._offset(shipment_id - 1), shipment_id, *values)
+            updated_shipment.set_id(shipment_id)
+
+    def delete_entity_by_id(self, shipment_id):
+        """Пометить запись перевозки удалённой."""
+        with self._lock:
+            if not self._is_live(shipment_id):
+                return
+            struct.pack_into("<q", self._mmap, self._offset(shipment_id - 1), 0)
+            self._live -= 1
+            self._write_header()
+
+    def get_count(self):
+        """Получить количество перевозок."""
+        return self._live
+
+    def close(self):
+        """Сбросить изменения на диск, обрезать незанятый запас и закрыть файл."""
+        if self._mmap.closed:
+            return
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.truncate(self._offset(self._slots))
+        self._file.close()
+
+    def __del__(self):
+        if hasattr(self, "_mmap"):
+            self.close()
+
+
+class ShipmentsRepositoryDB(DBRepository):
     """Репозиторий для работы с таблицей shipments в базе данных."""
-    def __init__(self, db_name):
-        from models import DBConnectionManager
-        self.db_manager = DBConnectionManager(db_name)
-        self._initialize_table()
+    entity_class = Shipment
+    table = "shipments"
+    id_column = "ShipmentId"
+    columns = {
+        "ShipmentId": "shipment_id", "RouteId": "route_id", "DriverId": "driver_id",
+        "DepartureDate": "departure_date", "ArrivalDate": "arrival_date", "Bonus": "bonus",
+    }
+    sortable_columns = ("ShipmentId", "RouteId", "DriverId", "DepartureDate", "ArrivalDate")
+    date_columns = ("DepartureDate", "ArrivalDate")
+    _INSERT_QUERY = """
+        INSERT INTO shipments (RouteId, DriverId, DepartureDate, ArrivalDate, Bonus)
+        VALUES (?, ?, ?, ?, ?)
+        """
+    _UPDATE_QUERY = """UPDATE shipments SET RouteId = ?, DriverId = ?, DepartureDate = ?, 
+                   ArrivalDate = ?, Bonus = ? WHERE ShipmentId = ?"""
+    _DELETE_QUERY = "DELETE FROM shipments WHERE ShipmentId = ?"
+    # Версия схемы (PRAGMA user_version), начиная с которой даты хранятся как ГГГГ-ММ-ДД.
+    _DATES_MIGRATED_VERSION = 1
 
     def _initialize_table(self):
         """Создание таблицы, если её нет."""
@@ -75,19 +605,26 @@ class ShipmentsRepositoryDB(MyEntityRepository):
         )
         """
         self.db_manager.execute_query(query)
+        self._migrate_dates()
         self.db_manager.commit()
 
-    def get_by_id(self, shipment_id):
-        """Получить перевозку по ID."""
-        query = "SELECT * FROM shipments WHERE ShipmentId = ?"
-        cursor = self.db_manager.execute_query(query, (shipment_id,))
-        result = cursor.fetchone()
-        if result:
-            return Shipment(**result)
-        return None
+    def _migrate_dates(self):
+        """Один раз перевести даты, сохранённые в формате ДД.ММ.ГГГГ, в сортируемый формат ГГГГ-ММ-ДД.
 
-    def get_k_n_short_list(self, k, n):
-        """Получить список k по счету n объектов класса Shipment."""
+        Выполненная миграция отмечается в PRAGMA user_version файла базы.
+        """
+        if self.db_manager.execute_query("PRAGMA user_version").fetchone()[0] >= self._DATES_MIGRATED_VERSION:
+            return
+        for column in self.date_columns:
+            self.db_manager.execute_query(f"""
+                UPDATE shipments
+                SET {column} = substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2)
+                WHERE {column} LIKE '__.__.____'
+            """)
+        self.db_manager.execute_query(f"PRAGMA user_version = {self._DATES_MIGRATED_VERSION}")
+
+    def get_k_n_short_list(self, k, n, lazy=False):
+        """Получить список k по счету n объектов класса Shipment (или LazyRow при lazy=True)."""
         offset = (k - 1) * n
         query = """
             SELECT ShipmentId, RouteId, DriverId, DepartureDate, ArrivalDate, Bonus
@@ -96,37 +633,46 @@ class ShipmentsRepositoryDB(MyEntityRepository):
         """
         cursor = self.db_manager.execute_query(query, (n, offset))
         results = cursor.fetchall()
-        return [Shipment(**dict(row)) for row in results]
+        return self._to_results(results, lazy)
 
-    def add_entity(self, shipment):
-        """Добавить перевозку в базу данных."""
-        query = """
-        INSERT INTO shipments (RouteId, DriverId, DepartureDate, ArrivalDate, Bonus)
-        VALUES (?, ?, ?, ?, ?)
-        """
-        self.db_manager.execute_query(query, (
+    @staticmethod
+    def _insert_params(shipment):
+        """Проверенные значения столбцов для вставки перевозки."""
+        return (
             Validator.validate_positive_integer(shipment.route_id, "ID маршрута"),
             Validator.validate_positive_integer(shipment.driver_id, "ID водителя"),
-            Validator.validate_date(shipment.departure_date, "Дата отправления"),
-            Validator.validate_date(shipment.arrival_date, "Дата прибытия"),
+            to_iso_date(Validator.validate_date(shipment.departure_date, "Дата отправления")),
+            to_iso_date(Validator.validate_date(shipment.arrival_date, "Дата прибытия")),
             Validator.validate_bonus(shipment.bonus, "Премия"),
+        )
+
+    @staticmethod
+    def _row_params(shipment):
+        """Значения столбцов таблицы shipments для объекта Shipment."""
+        return (shipment.route_id, shipment.driver_id, to_iso_date(shipment.departure_date),
+                to_iso_date(shipment.arrival_date), shipment.bonus)
+
+    def _find_by_date_range(self, column, start, end):
+        """Получить перевозки, у которых дата в столбце column лежит в [start, end]."""
+        query = f"""
+            SELECT {', '.join(self.columns)}
+            FROM shipments
+            WHERE {column} BETWEEN ? AND ?
+            ORDER BY {column}, ShipmentId
+        """
+        cursor = self.db_manager.execute_query(query, (
+            to_iso_date(Validator.validate_date(start, "Начало периода")),
+            to_iso_date(Validator.validate_date(end, "Конец периода")),
         ))
-        self.db_manager.commit()
+        return [self._to_entity(row) for row in cursor.fetchall()]
 
-    def replace_entity_by_id(self, shipment_id, updated_shipment):
-        """Обновить перевозку по ID."""
-        query = """UPDATE shipments SET RouteId = ?, DriverId = ?, DepartureDate = ?, 
-                   ArrivalDate = ?, Bonus = ? WHERE ShipmentId = ?"""
-        self.db_manager.execute_query(query, (updated_shipment.route_id, updated_shipment.driver_id,
-                                              updated_shipment.departure_date, updated_shipment.arrival_date,
-                                              updated_shipment.bonus, shipment_id))
-        self.db_manager.commit()
+    def find_by_departure_range(self, start, end):
+        """Получить перевозки с датой отправления в диапазоне [start, end] (ДД.ММ.ГГГГ)."""
+        return self._find_by_date_range("DepartureDate", start, end)
 
-    def delete_entity_by_id(self, shipment_id):
-        """Удалить перевозку по ID."""
-        query = "DELETE FROM shipments WHERE ShipmentId = ?"
-        self.db_manager.execute_query(query, (shipment_id,))
-        self.db_manager.commit()
+    def find_by_arrival_range(self, start, end):
+        """Получить перевозки с датой прибытия в диапазоне [start, end] (ДД.ММ.ГГГГ)."""
+        return self._find_by_date_range("ArrivalDate", start, end)
 
     def get_count(self):
         """Получить количество перевозок."""
@@ -0,0 +1,71 @@
+from models import DBConnectionManager
+from drivers import DriversRepositoryDB
+from routes import RoutesRepositoryDB
+from shipments import ShipmentsRepositoryDB
+
+
+class TransportDatabase:
+    """Водители, маршруты и перевозки, доступные через одно соединение SQLite.
+
+    В обычном режиме все три таблицы лежат в одном файле, поэтому внешние ключи
+    перевозок проверяются самой SQLite. Режим attach() подключает к файлу перевозок
+    отдельные файлы водителей и маршрутов командой ATTACH: соединения запросов
+    выполняются одной командой SQL, но внешние ключи между файлами не проверяются.
+    """
+
+    def __init__(self, db_name="databases/transport.db"):
+        self.db_manager = DBConnectionManager(db_name)
+        self.db_manager.add_setup_query("PRAGMA foreign_keys = ON")
+        self.drivers = DriversRepositoryDB(db_name)
+        self.routes = RoutesRepositoryDB(db_name)
+        self.shipments = ShipmentsRepositoryDB(db_name)
+        self._schemas = {"drivers": "main", "routes": "main", "shipments": "main"}
+
+    @classmethod
+    def attach(cls, drivers_db="databases/drivers.db", routes_db="databases/routes.db",
+               shipments_db="databases/shipments.db"):
+        """Открыть три отдельных файла через соединение файла перевозок.
+
+        Повторный вызов с тем же файлом перевозок подключает новые файлы водителей и маршрутов
+        вместо прежних: соединения пула открываются заново с новыми командами ATTACH.
+        """
+        database = cls.__new__(cls)
+        database.drivers = DriversRepositoryDB(drivers_db)
+        database.routes = RoutesRepositoryDB(routes_db)
+        database.shipments = ShipmentsRepositoryDB(shipments_db)
+        database.db_manager = database.shipments.db_manager
+        for schema, db_name in (("drivers_db", drivers_db), ("routes_db", routes_db)):
+            database.db_manager.add_setup_query(f"ATTACH DATABASE ? AS {schema}", (db_name,), key=("ATTACH", schema))
+        database._schemas = {"drivers": "drivers_db", "routes": "routes_db", "shipments": "main"}
+        return database
+
+    def shipments_with_details(self, driver_id=None, route_id=None):
+        """Получить перевозки вместе с водителем и маршрутом одним запросом.
+
+        Возвращает список кортежей (Shipment, Driver, Route).
+        """
+        aliases = (("s", self.shipments), ("d", self.drivers), ("r", self.routes))
+        select = ", ".join(f"{alias}.{column} AS {alias}_{column}"
+                           for alias, repository in aliases for column in repository.columns)
+        conditions, params = [], []
+        if driver_id is not None:
+            conditions.append("s.DriverId = ?")
+            params.append(driver_id)
+        if route_id is not None:
+            conditions.append("s.RouteId = ?")
+            params.append(route_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT {select}
+            FROM {self._schemas['shipments']}.shipments s
+            JOIN {self._schemas['drivers']}.drivers d ON d.DriverId = s.DriverId
+            JOIN {self._schemas['routes']}.routes r ON r.RouteId = s.RouteId
+            {where}
+            ORDER BY s.ShipmentId
+        """
+        rows = self.db_manager.execute_query(query, params).fetchall()
+        return [
+            tuple(repository._to_entity({column: row[f"{alias}_{column}"] for column in repository.columns})
+                  for alias, repository in aliases)
+            for row in rows
+        ]